@@ -73,7 +73,6 @@ export class AddProductComponent {
     const reader = new FileReader();
     reader.onload = (e: any) => {
       this.imagePreview = e.target.result;
-      this.product.imageUrl = e.target.result;
     };
     reader.readAsDataURL(file);
   }
@@ -103,12 +102,33 @@ export class AddProductComponent {
       return;
     }
 
+    if (!this.selectedFile) {
+      this.createProduct(this.product.imageUrl);
+      return;
+    }
+
+    // Upload the image file first, then create the product with its URL
+    this.productService.uploadProductImage(this.selectedFile).subscribe({
+      next: (res: any) => {
+        if (res.statusCode === 201) {
+          this.createProduct(res.data.imageUrl);
+        } else {
+          this.toastService.error(res.message);
+        }
+      },
+      error: (error) => {
+        this.toastService.showError('Failed to upload image. Please try again.');
+      }
+    });
+  }
+
+  createProduct(imageUrl: string): void {
     // Prepare product data
     const productData = {
       name: this.product.name.trim(),
       description: this.product.description.trim(),
       price: parseFloat(this.product.price.toString()),
-      imageUrl: this.product.imageUrl,
+      imageUrl: imageUrl,
       // status: 'available',
     };
 
@@ -1,4 +1,5 @@
-import { Component, OnInit } from '@angular/core';
+import { Component, OnDestroy, OnInit } from '@angular/core';
+import { Subscription } from 'rxjs';
 import { ProductService } from '../../../services/product.service';
 import { ToastService } from '../../../services/toast.service';
 
@@ -8,7 +9,7 @@ import { ToastService } from '../../../services/toast.service';
   templateUrl: './orders.component.html',
   styleUrls: ['./orders.component.scss']
 })
-export class OrdersComponent implements OnInit {
+export class OrdersComponent implements OnInit, OnDestroy {
   orders: any[] = [];
   loading = false;
   filterQuery = '';
@@ -16,26 +17,89 @@ export class OrdersComponent implements OnInit {
   counts = {
     total: 0,
     pending: 0,
-    confirmed: 0,
-    shipped: 0,
+    preparing: 0,
+    outForDelivery: 0,
     delivered: 0,
     cancelled: 0
   };
 
   selectedOrder: any = null; // for modal
+  selectedIds = new Set<string>(); // rows ticked for a bulk status change
+  batchStatus: string | null = null;
+  pageSize = 50;
+  nextCursor: string | null = null; // set while the server has more pages
+  private orderEvents?: Subscription;
 
-  statusOptions = ['Pending', 'Confirmed', 'Shipped', 'Delivered', 'Cancelled'];
+  statusOptions = ['pending', 'preparing', 'out-for-delivery', 'delivered', 'cancelled'];
+  statusLabels: { [status: string]: string } = {
+    'pending': 'Pending',
+    'preparing': 'Preparing',
+    'out-for-delivery': 'Out for delivery',
+    'delivered': 'Delivered',
+    'cancelled': 'Cancelled'
+  };
+  // Mirrors ORDER_TRANSITIONS in the backend (CustomerApp/order_states.py)
+  private transitions: { [status: string]: string[] } = {
+    'pending': ['preparing', 'cancelled'],
+    'preparing': ['out-for-delivery', 'cancelled'],
+    'out-for-delivery': ['delivered', 'cancelled'],
+    'delivered': [],
+    'cancelled': []
+  };
 
   constructor(private productService: ProductService, private toast: ToastService) {}
 
   ngOnInit(): void {
     // initial load with empty payload as requested
     this.searchOrders();
+    // live updates instead of re-polling the list
+    this.orderEvents = this.productService.orderEvents().subscribe(event => this.applyOrderEvent(event));
+  }
+
+  ngOnDestroy(): void {
+    this.orderEvents?.unsubscribe();
+  }
+
+  private applyOrderEvent(event: any): void {
+    if (event.type === 'reconnected') {
+      this.searchOrders();
+      return;
+    }
+    const order = this.orders.find(o => o._id === event.orderId);
+    if (event.type === 'order.status') {
+      // version guards against an older event arriving after our own update
+      if (order && (order.version || 0) < event.version) {
+        order.status = event.status;
+        order.version = event.version;
+        this.updateCounts();
+      }
+      if (this.selectedOrder && this.selectedOrder._id === event.orderId) {
+        this.selectedOrder.status = event.status;
+      }
+    } else if (event.type === 'order.created' && !order && !this.filterQuery
+        && (!this.filterStatus || this.filterStatus === event.status)) {
+      this.orders.unshift({
+        _id: event.orderId,
+        orderNumber: event.orderNumber,
+        fkUserId: event.fkUserId,
+        createdOn: event.createdOn,
+        totalPrice: event.totalPrice,
+        status: event.status,
+        version: event.version
+      });
+      this.updateCounts();
+    }
   }
 
-  searchOrders(): void {
+  // Loads the first page, or with loadMore the page after the last one shown
+  searchOrders(loadMore = false): void {
+    if (loadMore && !this.nextCursor) return;
     this.loading = true;
-    const payload: any = {};
+    // list view only needs order headers, line items are loaded in viewOrder()
+    const payload: any = { summary: true, limit: this.pageSize };
+    if (loadMore) {
+      payload.after = this.nextCursor;
+    }
     if (this.filterQuery && this.filterQuery.trim().length > 0) {
       payload.query = this.filterQuery.trim();
     }
@@ -47,7 +111,13 @@ export class OrdersComponent implements OnInit {
       next: (res: any) => {
         this.loading = false;
         if (res && res.statusCode === 200) {
-          this.orders = res.data || [];
+          if (loadMore) {
+            this.orders = [...this.orders, ...(res.data || [])];
+          } else {
+            this.orders = res.data || [];
+            this.selectedIds.clear();
+          }
+          this.nextCursor = res.nextCursor || null;
           this.updateCounts();
         } else {
           this.toast.error(res?.message || 'Failed to fetch orders');
@@ -62,11 +132,16 @@ export class OrdersComponent implements OnInit {
 
   private updateCounts(): void {
     this.counts.total = this.orders.length;
-    this.counts.pending = this.orders.filter(o => (o.status || '').toLowerCase() === 'pending').length;
-    this.counts.confirmed = this.orders.filter(o => (o.status || '').toLowerCase() === 'confirmed').length;
-    this.counts.shipped = this.orders.filter(o => (o.status || '').toLowerCase() === 'shipped').length;
-    this.counts.delivered = this.orders.filter(o => (o.status || '').toLowerCase() === 'delivered').length;
-    this.counts.cancelled = this.orders.filter(o => (o.status || '').toLowerCase() === 'cancelled').length;
+    this.counts.pending = this.orders.filter(o => o.status === 'pending').length;
+    this.counts.preparing = this.orders.filter(o => o.status === 'preparing').length;
+    this.counts.outForDelivery = this.orders.filter(o => o.status === 'out-for-delivery').length;
+    this.counts.delivered = this.orders.filter(o => o.status === 'delivered').length;
+    this.counts.cancelled = this.orders.filter(o => o.status === 'cancelled').length;
+  }
+
+  // Current status plus the ones it may move to
+  nextStatuses(order: any): string[] {
+    return [order.status, ...(this.transitions[order.status] || [])];
   }
 
   viewOrder(orderId: string): void {
@@ -88,17 +163,24 @@ export class OrdersComponent implements OnInit {
   }
 
   changeStatus(order: any, status: string): void {
-    if (!order || !order._id) return;
-    const payload = { _id: order._id, status };
+    if (!order || !order._id || status === order.status) return;
+    // Only applied if nobody changed the order since it was loaded
+    const payload = { _id: order._id, status, fromStatus: order.status, version: order.version };
     this.productService.updateUserOrder(payload).subscribe({
       next: (res: any) => {
         if (res && res.statusCode === 200) {
           this.toast.success(res.message || 'Order status updated');
           // update local copy
-          const idx = this.orders.findIndex(o => o._id === order._id);
-          if (idx > -1) this.orders[idx].status = status;
+          order.status = res.data.status;
+          order.version = res.data.version;
           this.updateCounts();
         } else {
+          if (res && res.statusCode === 409 && res.data) {
+            // Someone else changed it, show what it is now
+            order.status = res.data.status;
+            order.version = res.data.version;
+            this.updateCounts();
+          }
           this.toast.error(res?.message || 'Failed to update order status');
         }
       },
@@ -106,6 +188,56 @@ export class OrdersComponent implements OnInit {
     });
   }
 
+  toggleSelected(order: any): void {
+    if (this.selectedIds.has(order._id)) {
+      this.selectedIds.delete(order._id);
+    } else {
+      this.selectedIds.add(order._id);
+    }
+  }
+
+  toggleAll(checked: boolean): void {
+    this.selectedIds = new Set(checked ? this.orders.map(o => o._id) : []);
+  }
+
+  // One request for every ticked order, each checked against the status it was loaded with
+  applyBatchStatus(): void {
+    if (!this.batchStatus || this.selectedIds.size === 0) return;
+    const selected = this.orders.filter(o => this.selectedIds.has(o._id));
+    const payload = {
+      status: this.batchStatus,
+      orders: selected.map(o => ({ _id: o._id, fromStatus: o.status, version: o.version }))
+    };
+    this.productService.updateUserOrdersBatch(payload).subscribe({
+      next: (res: any) => {
+        if (res && res.statusCode === 200) {
+          const failed: string[] = [];
+          for (const result of res.data.results) {
+            const order = selected[result.index];
+            if (result.status) {
+              order.status = result.status;
+              order.version = result.version;
+            }
+            if (result.statusCode === 200) {
+              this.selectedIds.delete(order._id);
+            } else {
+              failed.push(`#${order.orderNumber || order._id}: ${result.message}`);
+            }
+          }
+          this.updateCounts();
+          if (failed.length) {
+            this.toast.error(`${res.message}. ${failed.join('; ')}`);
+          } else {
+            this.toast.success(res.message || 'Orders updated');
+          }
+        } else {
+          this.toast.error(res?.message || 'Failed to update orders');
+        }
+      },
+      error: () => this.toast.error('Failed to update orders')
+    });
+  }
+
   removeOrder(order: any): void {
     if (!order || !order._id) return;
     if (!confirm('Are you sure you want to remove this order?')) return;
@@ -64,6 +64,17 @@ export class ProductListComponent implements OnInit {
     });
   }
 
+  // Grid columns: 1 / 2 (sm) / 3 (md) / 4 (lg)
+  imageSizes = '(min-width: 1024px) 25vw, (min-width: 768px) 33vw, (min-width: 640px) 50vw, 100vw';
+
+  getImageSrcset(product: any, webp: boolean): string | null {
+    const variants = (product.imageVariants || []).filter((v: any) => (v.format === 'webp') === webp);
+    if (!variants.length) {
+      return null;
+    }
+    return variants.map((v: any) => `${this.getImageUrl(v.url)} ${v.width}w`).join(', ');
+  }
+
   getImageUrl(imageUrl: string): string {
     if (!imageUrl) {
       return 'assets/images/placeholder.png';
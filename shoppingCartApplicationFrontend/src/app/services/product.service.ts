@@ -1,4 +1,5 @@
 import { Inject, Injectable, PLATFORM_ID } from '@angular/core';
+import { isPlatformBrowser } from '@angular/common';
 import { environment } from '../../environments/environment';
 import { HttpClient, HttpHeaders, HttpParams } from '@angular/common/http';
 import { Observable } from 'rxjs';
@@ -19,6 +20,12 @@ export class ProductService {
     });
     return this.http.post(environment.baseUrl + 'api/product/product-creation', postObj, { headers });
   }
+  uploadProductImage(file: File): Observable<object> {
+    // Multipart body, the browser sets the Content-Type with its boundary
+    const formData = new FormData();
+    formData.append('image', file, file.name);
+    return this.http.post(environment.baseUrl + 'api/product/image-upload', formData);
+  }
   getProducts(): Observable<object> {
     const headers = new HttpHeaders({
       'Content-Type': 'application/json'
@@ -81,11 +88,67 @@ export class ProductService {
     });
     return this.http.post(environment.baseUrl + 'api/order/update', postObj, { headers });
   }
+  updateUserOrdersBatch(postObj: any): Observable<object> {
+    const headers = new HttpHeaders({
+      'Content-Type': 'application/json'
+    });
+    return this.http.post(environment.baseUrl + 'api/order/update/batch', postObj, { headers });
+  }
   removedUserOrder(postObj: any): Observable<object> {
     const headers = new HttpHeaders({
       'Content-Type': 'application/json'
     });
     return this.http.post(environment.baseUrl + 'api/order/remove', postObj, { headers });
   }
+  // Order changes pushed by the server (order.created / order.status), plus
+  // { type: 'reconnected' } after a dropped stream, when missed changes should be reloaded
+  orderEvents(orderId?: string): Observable<any> {
+    return new Observable<any>(observer => {
+      if (!isPlatformBrowser(this.platformId)) return;
+      let source: EventSource | undefined;
+      let retry: any;
+      let opened = false;
+      let closed = false;
+      const emit = (event: MessageEvent) => observer.next(JSON.parse(event.data));
+      // EventSource cannot send an Authorization header, so the stream is opened
+      // with a short-lived stream token instead of the login token. A token is
+      // only checked when connecting, each reconnect fetches a new one.
+      const connect = () => {
+        this.http.post(environment.baseUrl + 'api/async/order/events/token', {}).subscribe({
+          next: (res: any) => {
+            if (closed) return;
+            if (res?.statusCode !== 200) {
+              retry = setTimeout(connect, 5000);
+              return;
+            }
+            const params: any = { token: res.data.token };
+            if (orderId) params.orderId = orderId;
+            const query = new HttpParams({ fromObject: params }).toString();
+            source = new EventSource(environment.baseUrl + 'api/async/order/events?' + query);
+            source.onopen = () => {
+              if (opened) observer.next({ type: 'reconnected' });
+              opened = true;
+            };
+            source.onerror = () => {
+              // The browser would retry with the same, soon expired, token
+              source?.close();
+              retry = setTimeout(connect, 3000);
+            };
+            source.addEventListener('order.created', emit as EventListener);
+            source.addEventListener('order.status', emit as EventListener);
+          },
+          error: () => {
+            if (!closed) retry = setTimeout(connect, 5000);
+          }
+        });
+      };
+      connect();
+      return () => {
+        closed = true;
+        clearTimeout(retry);
+        source?.close();
+      };
+    });
+  }
 
 }
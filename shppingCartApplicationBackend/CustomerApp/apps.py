@@ -1,6 +1,25 @@
+import os
+import sys
+from traceback import format_exc
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class CustomerappConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'CustomerApp'
+
+    def ready(self):
+        # Declared indexes are created idempotently on every start
+        if not getattr(settings, 'MONGO_ENSURE_INDEXES', False):
+            return
+        # Other manage.py commands should not wait on the database
+        if os.path.basename(sys.argv[0]) == 'manage.py' and sys.argv[1:2] != ['runserver']:
+            return
+        from CustomerApp.indexes import ensure_indexes
+        try:
+            for collection, name, status in ensure_indexes():
+                if status != 'exists':
+                    print(f" Index {collection}.{name}: {status}")
+        except Exception:
+            print(format_exc())
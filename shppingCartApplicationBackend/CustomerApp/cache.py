@@ -0,0 +1,49 @@
+from time import monotonic
+from threading import Lock
+from collections import OrderedDict
+
+
+class TTLCache:
+    """
+    Small thread-safe LRU cache whose entries also expire after a TTL.
+    A per-entry expiry can be given to `set` to end an entry earlier.
+    """
+
+    def __init__(self, ttl=60, max_size=1000):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._lock = Lock()
+        self._entries = OrderedDict()
+
+    def get(self, key, default=None):
+        """Cached value for key, or default when missing or expired"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+            if monotonic() >= entry[0]:
+                del self._entries[key]
+                return default
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key, value, ttl=None):
+        """Store value, evicting the least recently used entry when full"""
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        with self._lock:
+            self._entries[key] = (monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def pop(self, key):
+        """Remove key if present"""
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
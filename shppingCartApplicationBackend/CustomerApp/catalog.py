@@ -0,0 +1,251 @@
+import os
+from time import monotonic, sleep
+from threading import RLock, Thread
+from collections import OrderedDict
+from hashlib import sha256
+from traceback import format_exc
+from django.conf import settings
+from zerasBurgerBackend.mongoConnection import db, read_db
+
+dbconn = db
+
+ACTIVE_PRODUCTS_QUERY = {'isInactive': False, 'activeFlag': True}
+
+
+class CatalogCache:
+    """
+    Process-local cache of the product catalog.
+
+    Holds a snapshot of every active product (one find per TTL) plus a
+    bounded LRU of products looked up by _id that are not part of the
+    snapshot. CreateProduct invalidates it, and with watch_changes a
+    change stream invalidates it for writes made by other processes.
+    Loads go to the replica read database, except the first one after an
+    invalidation, which reads the primary so a secondary that has not
+    replicated the write yet cannot put the old catalog back.
+    Cached documents are shared, callers must not mutate them; use
+    serialize_product to build a response.
+    """
+
+    def __init__(self, ttl=60, max_size=1000, watch_changes=False):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.watch_changes = watch_changes
+        self._lock = RLock()
+        self._snapshot = None
+        self._snapshot_expires = 0
+        self._by_id = {}
+        self._entries = OrderedDict()
+        self._version = 0
+        self._rendered = None
+        self._primary_reads = False
+
+    @property
+    def reads_primary(self):
+        """True until the catalog has been reloaded after an invalidation"""
+        return self._primary_reads
+
+    def source(self):
+        """Database handle the next load should read from"""
+        return dbconn if self._primary_reads else read_db
+
+    @property
+    def version(self):
+        """Incremented every time the cached catalog is reloaded or invalidated"""
+        return self._version
+
+    def invalidate(self, product_id=None):
+        """Drop the snapshot and the cached entry for product_id (or all entries)"""
+        with self._lock:
+            self._snapshot = None
+            self._snapshot_expires = 0
+            self._by_id = {}
+            if product_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(product_id, None)
+            self._primary_reads = True
+            self._version += 1
+
+    def snapshot(self):
+        """
+        (fresh, products): fresh is False once the TTL has passed and the
+        catalog has to be loaded again; products is None for a catalog too
+        large to keep in memory.
+        """
+        if self.watch_changes:
+            start_change_stream()
+        with self._lock:
+            return monotonic() < self._snapshot_expires, self._snapshot
+
+    def prime(self, products, version=None):
+        """
+        Install a freshly loaded list of active products as the snapshot.
+        Skipped when the cache was invalidated after version was read.
+        """
+        with self._lock:
+            # Invalidated while loading, the next call reloads again
+            if version is not None and version != self._version:
+                return
+            # A catalog larger than the cache is not kept in memory
+            self._snapshot = products if len(products) <= self.max_size else None
+            self._by_id = {product['_id']: product for product in self._snapshot or []}
+            self._snapshot_expires = monotonic() + self.ttl
+            self._primary_reads = False
+            self._version += 1
+
+    def _refresh(self):
+        """Reload the active catalog snapshot once the TTL has passed"""
+        version = self._version
+        fresh, products = self.snapshot()
+        if fresh:
+            return products
+        products = list(self.source().Products.find(ACTIVE_PRODUCTS_QUERY))
+        self.prime(products, version)
+        return products
+
+    def active_products(self):
+        """All active products in catalog order"""
+        products = self._refresh()
+        if products is None:
+            products = list(self.source().Products.find(ACTIVE_PRODUCTS_QUERY))
+        return products
+
+    def rendered(self, render):
+        """
+        Response body render(active_products()) as bytes plus a strong ETag.
+        Both are kept until the catalog is reloaded or invalidated, and the
+        ETag is a hash of the body, so it only changes with the content.
+        """
+        return self.cached_render() or self.render_products(self.active_products(), render)
+
+    def cached_render(self):
+        """
+        (body, etag) of the current catalog while it is fresh, else None.
+        Checked before loading the products, so a catalog too large for
+        the snapshot is still queried once per TTL and not per request.
+        """
+        with self._lock:
+            fresh, _ = self.snapshot()
+            if fresh and self._rendered and self._rendered[0] == self._version:
+                return self._rendered[1], self._rendered[2]
+        return None
+
+    def render_products(self, products, render):
+        """Encode products with render, reusing the result for this version"""
+        with self._lock:
+            version = self._version
+            if self._rendered and self._rendered[0] == version:
+                return self._rendered[1], self._rendered[2]
+        body = render(products)
+        etag = '"%s"' % sha256(body).hexdigest()[:32]
+        with self._lock:
+            if version == self._version:
+                self._rendered = (version, body, etag)
+        return body, etag
+
+    def get_products(self, product_ids, active_only=True):
+        """
+        Map of _id -> product for the given ids; unknown ids are absent.
+        Ids the cache cannot answer are resolved with one $in query.
+        """
+        self._refresh()
+        found, missing = self.cached_products(product_ids, active_only)
+        if missing:
+            fetched = list(self.source().Products.find(missing_products_query(missing, active_only)))
+            found.update(self.remember(fetched))
+        return found
+
+    def cached_products(self, product_ids, active_only=True):
+        """
+        Split product_ids into ({_id: product} answered from memory, [ids]
+        that need a database lookup). Never touches the database.
+        """
+        found = {}
+        missing = []
+        with self._lock:
+            now = monotonic()
+            for product_id in product_ids:
+                product = self._by_id.get(product_id)
+                if product is None:
+                    entry = self._entries.get(product_id)
+                    if entry and now < entry[0]:
+                        self._entries.move_to_end(product_id)
+                        product = entry[1]
+                if product is not None and (not active_only or product.get('activeFlag')):
+                    found[product_id] = product
+                else:
+                    missing.append(product_id)
+        return found, missing
+
+    def remember(self, products):
+        """Keep products fetched by _id in the LRU, returns them by _id"""
+        with self._lock:
+            expires = monotonic() + self.ttl
+            for product in products:
+                self._entries[product['_id']] = (expires, product)
+                self._entries.move_to_end(product['_id'])
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        return {product['_id']: product for product in products}
+
+    def get_product(self, product_id, active_only=True):
+        """Single product by _id or None"""
+        return self.get_products([product_id], active_only=active_only).get(product_id)
+
+
+def missing_products_query(product_ids, active_only=True):
+    """Products filter for ids the cache could not answer"""
+    query = {'_id': {'$in': list(product_ids)}}
+    if active_only:
+        query['activeFlag'] = True
+    return query
+
+
+def serialize_product(product):
+    """JSON ready copy of a product document"""
+    item = dict(product)
+    item['_id'] = str(item['_id'])
+    if 'createdOn' in item:
+        item['createdOn'] = item['createdOn'].isoformat()
+    return item
+
+
+def _watch_products(retry_seconds=5):
+    """
+    Invalidate the cache on every change to the Products collection. The
+    stream is reopened after errors; changes made while it was down are
+    lost, so reopening drops the whole cache.
+    """
+    opened = False
+    while True:
+        try:
+            with dbconn.Products.watch(full_document='default') as stream:
+                if opened:
+                    catalog_cache.invalidate()
+                opened = True
+                for change in stream:
+                    catalog_cache.invalidate(change.get('documentKey', {}).get('_id'))
+        except Exception:
+            # Change streams need a replica set, the TTL still bounds staleness
+            print(format_exc())
+            sleep(retry_seconds)
+
+
+_watcher_pid = None
+
+
+def start_change_stream():
+    """Start the change stream watcher once per (forked) worker process"""
+    global _watcher_pid
+    if _watcher_pid == os.getpid():
+        return
+    _watcher_pid = os.getpid()
+    Thread(target=_watch_products, name='catalog-change-stream', daemon=True).start()
+
+
+catalog_cache = CatalogCache(
+    ttl=getattr(settings, 'CATALOG_CACHE_TTL', 60),
+    max_size=getattr(settings, 'CATALOG_CACHE_MAX_SIZE', 1000),
+    watch_changes=getattr(settings, 'CATALOG_CHANGE_STREAM', False)
+)
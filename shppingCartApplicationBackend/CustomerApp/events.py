@@ -0,0 +1,196 @@
+import os
+import asyncio
+from json import dumps
+from time import sleep
+from collections import namedtuple
+from threading import Lock, Thread
+from traceback import format_exc
+from django.conf import settings
+from django.utils.module_loading import import_string
+from zerasBurgerBackend.mongoConnection import db
+from CustomerApp.order_states import normalize_status
+
+dbconn = db
+
+# Admins listen on ALL_ORDERS, customers on their own user channel
+ALL_ORDERS = 'orders'
+
+# Inserts and status changes on Orders, for the change stream backend
+ORDER_CHANGES_PIPELINE = [{'$match': {'$or': [
+    {'operationType': 'insert'},
+    {'operationType': 'update', 'updateDescription.updatedFields.status': {'$exists': True}},
+]}}]
+
+# What a subscriber receives: the order it is about and the encoded SSE frame
+OrderEvent = namedtuple('OrderEvent', ['order_id', 'frame'])
+
+
+def user_channel(user_id):
+    return f'user:{user_id}'
+
+
+def order_event(kind, order):
+    """
+    (channels, OrderEvent) for an order document, kind is order.created
+    or order.status. The frame is encoded once and shared by every
+    subscriber.
+    """
+    created_on = order.get('createdOn')
+    data = {
+        'type': kind,
+        'orderId': str(order['_id']),
+        'orderNumber': order.get('orderNumber'),
+        'fkUserId': str(order['fkUserId']) if order.get('fkUserId') else None,
+        'status': normalize_status(order.get('status')) or order.get('status'),
+        'version': order.get('version', 0),
+        'totalPrice': order.get('totalPrice'),
+        'createdOn': created_on.isoformat() if hasattr(created_on, 'isoformat') else created_on,
+    }
+    channels = [ALL_ORDERS]
+    if data['fkUserId']:
+        channels.append(user_channel(data['fkUserId']))
+    return channels, OrderEvent(data['orderId'], f'event: {kind}\ndata: {dumps(data)}\n\n')
+
+
+class Subscription:
+    """
+    Events for one open stream. Publishers may run on any thread, events
+    are handed to the subscriber's event loop. A subscriber that falls
+    queue_size events behind is dropped: its queue is cleared and get()
+    returns None, so the stream ends and the client reconnects and reloads.
+    """
+
+    def __init__(self, channels, loop, queue_size):
+        self.channels = channels
+        self.loop = loop
+        self.queue = asyncio.Queue(queue_size)
+        self.closed = False
+
+    def deliver(self, event):
+        self.loop.call_soon_threadsafe(self._put, event)
+
+    def _put(self, event):
+        if self.closed:
+            return
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.closed = True
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(None)
+
+    async def get(self):
+        return await self.queue.get()
+
+
+class InMemoryBroker:
+    """
+    Fans events out to the subscribers of this process. Enough for a
+    single ASGI process; with several nodes use ChangeStreamBroker or a
+    backend of your own with the same publish/subscribe/unsubscribe.
+    """
+
+    def __init__(self, queue_size=100):
+        self.queue_size = queue_size
+        self._lock = Lock()
+        self._channels = {}
+
+    def subscribe(self, channels, loop=None):
+        subscription = Subscription(channels, loop or asyncio.get_running_loop(), self.queue_size)
+        with self._lock:
+            for channel in channels:
+                self._channels.setdefault(channel, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        subscription.closed = True
+        with self._lock:
+            for channel in subscription.channels:
+                subscribers = self._channels.get(channel)
+                if subscribers is not None:
+                    subscribers.discard(subscription)
+                    if not subscribers:
+                        del self._channels[channel]
+
+    def publish(self, channels, event):
+        self._deliver(channels, event)
+
+    def _deliver(self, channels, event):
+        with self._lock:
+            targets = set()
+            for channel in channels:
+                targets.update(self._channels.get(channel, ()))
+        for subscription in targets:
+            try:
+                subscription.deliver(event)
+            except RuntimeError:
+                # Its event loop is gone
+                self.unsubscribe(subscription)
+
+
+class ChangeStreamBroker(InMemoryBroker):
+    """
+    Order events read from a change stream on Orders, so a write made by
+    any node (or a management command) reaches subscribers on every node.
+    Needs a replica set, like CATALOG_CHANGE_STREAM. publish() does
+    nothing: local writes arrive through the stream as well. The watcher
+    starts with the first subscriber of a (forked) worker process and
+    resumes after errors.
+    """
+
+    def __init__(self, queue_size=100, retry_seconds=5):
+        super().__init__(queue_size)
+        self.retry_seconds = retry_seconds
+        self._watcher_pid = None
+
+    def subscribe(self, channels, loop=None):
+        subscription = super().subscribe(channels, loop)
+        with self._lock:
+            if self._watcher_pid != os.getpid():
+                self._watcher_pid = os.getpid()
+                Thread(target=self._watch, name='order-change-stream', daemon=True).start()
+        return subscription
+
+    def publish(self, channels, event):
+        pass
+
+    def _watch(self):
+        resume_token = None
+        while True:
+            try:
+                with dbconn.Orders.watch(ORDER_CHANGES_PIPELINE, full_document='updateLookup',
+                                         resume_after=resume_token) as stream:
+                    for change in stream:
+                        resume_token = stream.resume_token
+                        order = change.get('fullDocument')
+                        if order is None:
+                            continue
+                        kind = 'order.created' if change['operationType'] == 'insert' else 'order.status'
+                        self._deliver(*order_event(kind, order))
+            except Exception:
+                print(format_exc())
+                sleep(self.retry_seconds)
+
+
+def _build_broker():
+    backend = getattr(settings, 'ORDER_EVENTS_BACKEND', 'memory')
+    queue_size = getattr(settings, 'ORDER_EVENTS_QUEUE_SIZE', 100)
+    if backend == 'memory':
+        return InMemoryBroker(queue_size)
+    if backend == 'change-stream':
+        return ChangeStreamBroker(queue_size)
+    # Dotted path to a broker class, e.g. one backed by Redis pub/sub
+    return import_string(backend)(queue_size)
+
+
+order_broker = _build_broker()
+
+
+def publish_order_event(kind, order):
+    """Push an order change to the admin dashboard and the order's customer"""
+    try:
+        order_broker.publish(*order_event(kind, order))
+    except Exception:
+        # Never fail the write that triggered the event
+        print(format_exc())
@@ -0,0 +1,122 @@
+import os
+from io import BytesIO
+from datetime import datetime
+from traceback import format_exception
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from zerasBurgerBackend.mongoConnection import db
+from CustomerApp.catalog import catalog_cache
+from CustomerApp.storage import image_store
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Pillow is optional, products then keep only the original image
+    Image = ImageOps = None
+
+dbconn = db
+
+# Pillow format name and file extension of each variant format
+VARIANT_FORMATS = {
+    'jpg': ('JPEG', 'jpg'),
+    'png': ('PNG', 'png'),
+    'webp': ('WEBP', 'webp'),
+}
+# Variants of a GIF are static, its first frame as PNG
+FALLBACK_FORMAT = {'jpg': 'jpg', 'png': 'png', 'gif': 'png', 'webp': None}
+
+_variant_pool = None
+
+
+def variant_widths():
+    return sorted(getattr(settings, 'PRODUCT_IMAGE_VARIANT_WIDTHS', (320, 640, 1024)))
+
+
+def _variant_executor():
+    """Image processing pool, created once per (forked) worker process"""
+    global _variant_pool
+    if _variant_pool is None or _variant_pool[0] != os.getpid():
+        workers = getattr(settings, 'PRODUCT_IMAGE_WORKERS', 2)
+        _variant_pool = (os.getpid(), ThreadPoolExecutor(max_workers=workers, thread_name_prefix='image-variants'))
+    return _variant_pool[1]
+
+
+def _encode(image, variant_format):
+    pil_format, _ = VARIANT_FORMATS[variant_format]
+    if pil_format == 'JPEG' and image.mode != 'RGB':
+        image = image.convert('RGB')
+    buffer = BytesIO()
+    options = {'quality': getattr(settings, 'PRODUCT_IMAGE_QUALITY', 80)} if pil_format in ('JPEG', 'WEBP') else {'optimize': True}
+    image.save(buffer, pil_format, **options)
+    return buffer.getvalue()
+
+
+def generate_variants(image_file, source_format):
+    """
+    Resized copies of an image, one per configured width smaller than the
+    original (or one at the original width for a small image), each as
+    WebP plus a fallback in the original format, written to the image
+    store under their content hash. Returns a list of
+    {'width', 'height', 'format', 'url', 'bytes'} sorted by width.
+    """
+    formats = ['webp']
+    if FALLBACK_FORMAT.get(source_format):
+        formats.append(FALLBACK_FORMAT[source_format])
+
+    with Image.open(image_file) as original:
+        original.seek(0)
+        image = ImageOps.exif_transpose(original)
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA' if 'transparency' in image.info or image.mode in ('LA', 'PA') else 'RGB')
+        widths = [width for width in variant_widths() if width < image.width] or [image.width]
+
+        variants = []
+        for width in widths:
+            height = max(1, round(image.height * width / image.width))
+            resized = image if width == image.width else image.resize((width, height), Image.LANCZOS)
+            for variant_format in formats:
+                data = _encode(resized, variant_format)
+                variants.append({
+                    'width': width,
+                    'height': height,
+                    'format': variant_format,
+                    'url': image_store.put_bytes(data, VARIANT_FORMATS[variant_format][1]),
+                    'bytes': len(data)
+                })
+    return variants
+
+
+def process_product_image(product_id, image_url):
+    """
+    Generate the variants of a product's stored image and record them on
+    the product. Skipped when the product's image changed meanwhile.
+    """
+    key = image_store.key_for_url(image_url)
+    if Image is None or not key or not image_store.exists(key):
+        return None
+    with image_store.open(key) as image_file:
+        variants = generate_variants(image_file, os.path.splitext(key)[1].lstrip('.').lower())
+    result = dbconn.Products.update_one(
+        {'_id': product_id, 'imageUrl': image_url},
+        {'$set': {'imageVariants': variants, 'updatedOn': datetime.now()}}
+    )
+    if result.modified_count:
+        catalog_cache.invalidate(product_id)
+    return variants
+
+
+def _log_failure(future):
+    error = future.exception()
+    if error is not None:
+        print(''.join(format_exception(type(error), error, error.__traceback__)))
+
+
+def schedule_product_image(product_id, image_url):
+    """
+    Queue variant generation on the background pool. Does nothing for
+    external image URLs or when Pillow is not installed.
+    """
+    if Image is None or not image_store.key_for_url(image_url):
+        return None
+    future = _variant_executor().submit(process_product_image, product_id, image_url)
+    future.add_done_callback(_log_failure)
+    return future
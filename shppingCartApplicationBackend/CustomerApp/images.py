@@ -0,0 +1,130 @@
+import os
+from hashlib import sha256
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
+from django.core.files.uploadhandler import FileUploadHandler, StopUpload, SkipFile
+from CustomerApp.storage import image_store
+
+IMAGE_EXTENSIONS = ['jpg', 'png', 'gif', 'webp']
+# Multipart headers and boundaries around the file in an upload request
+MULTIPART_OVERHEAD = 64 * 1024
+
+
+def max_image_bytes():
+    return getattr(settings, 'PRODUCT_IMAGE_MAX_BYTES', 5 * 1024 * 1024)
+
+
+def sniff_image_format(head):
+    """Image extension from the first bytes of a file, None if not an allowed image"""
+    if head.startswith(b'\xff\xd8\xff'):
+        return 'jpg'
+    if head.startswith(b'\x89PNG\r\n\x1a\n'):
+        return 'png'
+    if head[:6] in (b'GIF87a', b'GIF89a'):
+        return 'gif'
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return 'webp'
+    return None
+
+
+def save_image_bytes(image_bytes, file_ext):
+    """Store a decoded image in the image store and return its URL"""
+    return image_store.put_bytes(image_bytes, file_ext)
+
+
+def stored_image_exists(image_url):
+    """True for a URL of an image held by the image store"""
+    key = image_store.key_for_url(image_url)
+    return bool(key) and image_store.exists(key)
+
+
+class ProductImageUploadHandler(FileUploadHandler):
+    """
+    Streams the multipart field "image" into the image store.
+
+    Only one chunk (chunk_size bytes) is held in memory at a time. The
+    format is checked from the first bytes, the size as every chunk
+    arrives, and an oversized or unsupported upload stops the parse at
+    that point. Any other file field is skipped. After parsing, `error`
+    holds a message for a rejected upload and `image_url` the stored URL.
+    The content hash is computed while streaming, so storing the file
+    is a rename (or an upload) with no second pass over the bytes.
+    """
+    chunk_size = 64 * 1024
+
+    def __init__(self, request=None, max_bytes=None):
+        super().__init__(request)
+        self.max_bytes = max_bytes or max_image_bytes()
+        self.error = None
+        self.image_url = None
+        self._file = None
+        self._temp_path = None
+        self._file_ext = None
+        self._size = 0
+        self._hash = None
+
+    def handle_raw_input(self, input_data, META, content_length, boundary, encoding=None):
+        if content_length and content_length > self.max_bytes + MULTIPART_OVERHEAD:
+            self.error = self._too_large_message()
+
+    def new_file(self, field_name, *args, **kwargs):
+        super().new_file(field_name, *args, **kwargs)
+        if self.error:
+            raise StopUpload(connection_reset=True)
+        if field_name != 'image' or self._temp_path or self.image_url:
+            raise SkipFile()
+        self._temp_path = image_store.new_temp_path()
+        self._file = open(self._temp_path, 'wb')
+        self._size = 0
+        self._hash = sha256()
+
+    def receive_data_chunk(self, raw_data, start):
+        if start == 0:
+            self._file_ext = sniff_image_format(raw_data[:16])
+            if self._file_ext is None:
+                self._reject(f'Image format not supported. Allowed: {", ".join(IMAGE_EXTENSIONS)}')
+        self._size += len(raw_data)
+        if self._size > self.max_bytes:
+            self._reject(self._too_large_message())
+        self._file.write(raw_data)
+        self._hash.update(raw_data)
+        return None
+
+    def file_complete(self, file_size):
+        if self._file is None:
+            return None
+        self._file.close()
+        self._file = None
+        if not file_size:
+            self._discard()
+            self.error = 'Image file is empty'
+            return None
+        temp_path, self._temp_path = self._temp_path, None
+        self.image_url = image_store.put_file(temp_path, self._hash.hexdigest(), self._file_ext)
+        return UploadedFile(name=os.path.basename(self.image_url), content_type=self.content_type, size=file_size)
+
+    def upload_interrupted(self):
+        self._discard()
+
+    def upload_complete(self):
+        # A stopped upload never reaches file_complete
+        self._discard()
+
+    def _reject(self, message):
+        self.error = message
+        self._discard()
+        raise StopUpload(connection_reset=True)
+
+    def _discard(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if self._temp_path:
+            try:
+                os.remove(self._temp_path)
+            except FileNotFoundError:
+                pass
+            self._temp_path = None
+
+    def _too_large_message(self):
+        return f'Image size exceeds {round(self.max_bytes / (1024 * 1024), 2):g}MB limit'
@@ -0,0 +1,152 @@
+from datetime import datetime
+from pymongo import ASCENDING, DESCENDING, TEXT, UpdateOne, UpdateMany
+from pymongo.errors import OperationFailure
+from zerasBurgerBackend.mongoConnection import db
+
+dbconn = db
+
+# Every index the hot paths rely on, declared in one place.
+# collection -> list of (name, keys, options)
+INDEXES = {
+    'clnUsers': [
+        ('email_unique', [('email', ASCENDING)], {'unique': True}),
+        ('nameLower_prefix', [('nameLower', ASCENDING)], {}),
+        ('name_text', [('name', TEXT)], {}),
+    ],
+    'Products': [
+        ('active_products', [('activeFlag', ASCENDING), ('isInactive', ASCENDING)], {}),
+    ],
+    'Cart': [
+        # One active row per (user, product), also serves the cart details query
+        ('active_user_product_unique', [('fkUserId', ASCENDING), ('fkProductId', ASCENDING)],
+         {'unique': True, 'partialFilterExpression': {'activeFlag': True}}),
+    ],
+    'Orders': [
+        ('orderNumber_unique', [('orderNumber', ASCENDING)], {'unique': True}),
+        ('active_status_created', [('activeFlag', ASCENDING), ('isInactive', ASCENDING), ('status', ASCENDING), ('createdOn', DESCENDING)], {}),
+        ('active_created', [('activeFlag', ASCENDING), ('isInactive', ASCENDING), ('createdOn', DESCENDING), ('_id', DESCENDING)], {}),
+        ('fkUserId', [('fkUserId', ASCENDING)], {}),
+    ],
+}
+
+# Indexes replaced by a declared one, dropped once their successor exists.
+# collection -> list of (name, successor)
+RETIRED_INDEXES = {
+    'Cart': [
+        ('user_product_active', 'active_user_product_unique'),
+    ],
+}
+
+
+def dedupe_active_cart_rows(dry_run=False):
+    """
+    Merge duplicate active Cart rows for the same (fkUserId, fkProductId),
+    left over from before the unique index, so it can be built. The most
+    recently updated row keeps the summed quantity, the others are
+    deactivated. Returns the number of (user, product) pairs merged.
+    """
+    duplicates = list(dbconn.Cart.aggregate([
+        {'$match': {'activeFlag': True}},
+        {'$sort': {'updatedOn': -1, '_id': -1}},
+        {'$group': {
+            '_id': {'fkUserId': '$fkUserId', 'fkProductId': '$fkProductId'},
+            'ids': {'$push': '$_id'},
+            'quantity': {'$sum': '$quantity'},
+            'unitPrice': {'$first': '$unitPrice'},
+        }},
+        {'$match': {'ids.1': {'$exists': True}}},
+    ], allowDiskUse=True))
+    if dry_run or not duplicates:
+        return len(duplicates)
+
+    writes = []
+    for group in duplicates:
+        keep, *extra = group['ids']
+        update = {'quantity': group['quantity']}
+        if group.get('unitPrice') is not None:
+            update['totalPrice'] = group['quantity'] * group['unitPrice']
+        writes.append(UpdateOne({'_id': keep}, {'$set': update}))
+        writes.append(UpdateMany(
+            {'_id': {'$in': extra}},
+            {'$set': {'activeFlag': False, 'isInactive': True, 'updatedOn': datetime.now()}}
+        ))
+    dbconn.Cart.bulk_write(writes, ordered=False)
+    return len(duplicates)
+
+
+# Run before building an index that existing data could violate.
+# (collection, name) -> function(dry_run) returning how many conflicts it resolved
+PREPARE_INDEX = {
+    ('Cart', 'active_user_product_unique'): dedupe_active_cart_rows,
+}
+
+
+def ensure_indexes(dry_run=False):
+    """
+    Create every declared index that is missing, after fixing data that
+    would make its build fail (PREPARE_INDEX), then drop retired indexes
+    whose successor exists. create_index is a no-op for an index that
+    already exists with the same spec, so this is safe to run on every
+    start. Returns a list of (collection, name, status).
+    """
+    results = []
+    for collection, indexes in INDEXES.items():
+        existing = _existing_index_names(collection)
+        for name, keys, options in indexes:
+            if name in existing:
+                results.append((collection, name, 'exists'))
+                continue
+            prepare = PREPARE_INDEX.get((collection, name))
+            try:
+                if prepare is not None:
+                    fixed = prepare(dry_run=dry_run)
+                    if fixed:
+                        status = f'{fixed} conflicts to resolve' if dry_run else f'resolved {fixed} conflicts'
+                        results.append((collection, name, status))
+                if dry_run:
+                    results.append((collection, name, 'missing'))
+                    continue
+                dbconn[collection].create_index(keys, name=name, **options)
+                existing.add(name)
+                results.append((collection, name, 'created'))
+            except OperationFailure as e:
+                results.append((collection, name, f'failed: {e}'))
+
+        for name, successor in RETIRED_INDEXES.get(collection, []):
+            if name not in existing or successor not in existing:
+                continue
+            if dry_run:
+                results.append((collection, name, 'retired, would drop'))
+                continue
+            try:
+                dbconn[collection].drop_index(name)
+                results.append((collection, name, 'dropped'))
+            except OperationFailure as e:
+                results.append((collection, name, f'failed: {e}'))
+    return results
+
+
+def index_report():
+    """
+    Compare the declared indexes with the database. Returns
+    {'missing': [(collection, name)], 'unused': [(collection, name, ops)]}
+    where unused lists indexes that are undeclared or have not served a
+    single operation since the server started ($indexStats).
+    """
+    report = {'missing': [], 'unused': []}
+    for collection, indexes in INDEXES.items():
+        declared = {name for name, _, _ in indexes}
+        existing = _existing_index_names(collection)
+        report['missing'].extend((collection, name) for name in sorted(declared - existing))
+        for stats in dbconn[collection].aggregate([{'$indexStats': {}}]):
+            if stats['name'] == '_id_':
+                continue
+            ops = stats.get('accesses', {}).get('ops', 0)
+            if stats['name'] not in declared or ops == 0:
+                report['unused'].append((collection, stats['name'], ops))
+    return report
+
+
+def _existing_index_names(collection):
+    """Names of the indexes currently present on a collection"""
+    return {index['name'] for index in dbconn[collection].list_indexes()}
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+from CustomerApp.indexes import ensure_indexes, index_report
+from CustomerApp.search import backfill_search_fields
+
+
+class Command(BaseCommand):
+    """
+    Create the MongoDB indexes declared in CustomerApp.indexes and
+    backfill the fields they cover on older documents
+    Usage: python manage.py ensure_indexes [--dry-run] [--report]
+    """
+    help = 'Create missing MongoDB indexes and report missing or unused ones'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Only list missing indexes, do not create them')
+        parser.add_argument('--report', action='store_true', help='Also report unused indexes using $indexStats')
+
+    def handle(self, *args, **options):
+        for collection, name, status in ensure_indexes(dry_run=options['dry_run']):
+            style = self.style.ERROR if status.startswith('failed') or status == 'missing' else self.style.SUCCESS
+            self.stdout.write(style(f'{collection}.{name}: {status}'))
+
+        # Collection wide write, kept out of the request path
+        count = backfill_search_fields(dry_run=options['dry_run'])
+        verb = 'need' if options['dry_run'] else 'backfilled'
+        self.stdout.write(self.style.SUCCESS(f'clnUsers.nameLower: {count} users {verb}'))
+
+        if options['report']:
+            report = index_report()
+            for collection, name in report['missing']:
+                self.stdout.write(self.style.ERROR(f'missing: {collection}.{name}'))
+            for collection, name, ops in report['unused']:
+                self.stdout.write(self.style.WARNING(f'unused: {collection}.{name} ({ops} ops)'))
+            if not report['missing'] and not report['unused']:
+                self.stdout.write(self.style.SUCCESS('All declared indexes present and in use'))
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+from zerasBurgerBackend.mongoConnection import db
+from CustomerApp.image_variants import Image, process_product_image
+from CustomerApp.storage import image_store
+
+
+class Command(BaseCommand):
+    """
+    Generate image variants for products stored before they existed
+    Usage: python manage.py process_product_images [--all]
+    """
+    help = 'Generate thumbnails and WebP variants for product images'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Also regenerate products that already have variants')
+
+    def handle(self, *args, **options):
+        if Image is None:
+            self.stdout.write(self.style.ERROR('Pillow is not installed'))
+            return
+        query = {'activeFlag': True}
+        if not options['all']:
+            query['imageVariants'] = {'$exists': False}
+        for product in db.Products.find(query, projection={'imageUrl': 1}):
+            if not image_store.key_for_url(product.get('imageUrl')):
+                continue
+            try:
+                variants = process_product_image(product['_id'], product['imageUrl'])
+            except Exception as e:
+                self.stdout.write(self.style.ERROR(f'{product["_id"]}: {e}'))
+                continue
+            if variants is None:
+                self.stdout.write(self.style.WARNING(f'{product["_id"]}: image file missing'))
+            else:
+                self.stdout.write(self.style.SUCCESS(f'{product["_id"]}: {len(variants)} variants'))
@@ -0,0 +1,148 @@
+from datetime import datetime
+from bson.objectid import ObjectId
+from pymongo import ReturnDocument
+from zerasBurgerBackend.mongoConnection import db
+
+dbconn = db
+
+ORDER_STATUSES = ['pending', 'preparing', 'out-for-delivery', 'delivered', 'cancelled']
+
+# Allowed moves, delivered and cancelled are final
+ORDER_TRANSITIONS = {
+    'pending': ['preparing', 'cancelled'],
+    'preparing': ['out-for-delivery', 'cancelled'],
+    'out-for-delivery': ['delivered', 'cancelled'],
+    'delivered': [],
+    'cancelled': [],
+}
+
+# Spellings stored before the state machine: the admin dropdown wrote
+# capitalized names, and Confirmed/Shipped map onto the kitchen states
+STORED_ALIASES = {
+    'pending': ['pending', 'Pending'],
+    'preparing': ['preparing', 'Confirmed', 'confirmed'],
+    'out-for-delivery': ['out-for-delivery', 'Shipped', 'shipped'],
+    'delivered': ['delivered', 'Delivered'],
+    'cancelled': ['cancelled', 'Cancelled'],
+}
+_CANONICAL = {alias: status for status, aliases in STORED_ALIASES.items() for alias in aliases}
+
+
+class OrderTransitionError(Exception):
+    """The order could not be moved to the requested status"""
+
+    def __init__(self, message, status_code=409, order=None):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+        self.order = order
+
+
+def normalize_status(status):
+    """Canonical status for a stored or requested spelling, None if unknown"""
+    if not isinstance(status, str):
+        return None
+    return _CANONICAL.get(status.strip()) or _CANONICAL.get(status.strip().lower())
+
+
+def stored_statuses(status):
+    """Every stored spelling of a canonical status, for query filters"""
+    return STORED_ALIASES.get(status, [status])
+
+
+def _version_filter(version):
+    # Orders created before the version field count as version 0
+    return {'$in': [0, None]} if version == 0 else version
+
+
+def transition_query(order_id, target, expected_status=None, expected_version=None):
+    """
+    (canonical target, filter) for moving an active order to target. The
+    filter only matches while the order is in expected_status (or,
+    without one, any status that may move to target) and, when given,
+    still at expected_version. Raises OrderTransitionError (400) for an
+    unknown status or a move the state machine does not allow.
+    """
+    canonical = normalize_status(target)
+    if canonical is None:
+        raise OrderTransitionError(f'Invalid status. Allowed: {", ".join(ORDER_STATUSES)}', 400)
+
+    if expected_status is not None:
+        current = normalize_status(expected_status)
+        if current is None:
+            raise OrderTransitionError(f'Invalid current status. Allowed: {", ".join(ORDER_STATUSES)}', 400)
+        if canonical not in ORDER_TRANSITIONS[current]:
+            raise OrderTransitionError(f'Cannot change order from {current} to {canonical}', 400)
+        sources = [current]
+    else:
+        sources = [status for status, targets in ORDER_TRANSITIONS.items() if canonical in targets]
+
+    query = {
+        '_id': order_id,
+        'activeFlag': True,
+        'isInactive': False,
+        'status': {'$in': [alias for status in sources for alias in stored_statuses(status)]}
+    }
+    if expected_version is not None:
+        query['version'] = _version_filter(expected_version)
+    return canonical, query
+
+
+def transition_update(target, transition_id=None):
+    """
+    Sets the new status and bumps version, so stale writers stop matching.
+    transitionId is unique per write, which lets a bulk write tell which
+    orders it changed itself.
+    """
+    return {
+        '$set': {'status': target, 'transitionId': transition_id or ObjectId(), 'updatedOn': datetime.now()},
+        '$inc': {'version': 1}
+    }
+
+
+def explain_failure(current, order_id, target, expected_status=None, expected_version=None):
+    """
+    OrderTransitionError for a conditional update that matched nothing,
+    given the order as it is now (None when missing): 404 for a missing
+    order, 409 with the order's current status and version otherwise.
+    """
+    if current is None or not current.get('activeFlag', True) or current.get('isInactive', False):
+        return OrderTransitionError('bad request! Order not found', 404)
+    current_status = normalize_status(current.get('status')) or current.get('status')
+    current = {'orderId': str(order_id), 'status': current_status, 'version': current.get('version', 0)}
+    if current_status == target:
+        return OrderTransitionError(f'Order is already {target}', 409, current)
+    if (expected_version is not None and current['version'] != expected_version) or \
+            (expected_status is not None and current_status != normalize_status(expected_status)):
+        return OrderTransitionError('Order was changed by someone else, reload and try again', 409, current)
+    return OrderTransitionError(f'Cannot change order from {current_status} to {target}', 409, current)
+
+
+def failed_transition(order_id, target, expected_status=None, expected_version=None):
+    """Reads the order to explain a failed update, only on the failure path"""
+    current = dbconn.Orders.find_one(
+        {'_id': order_id, 'activeFlag': True, 'isInactive': False},
+        projection={'status': 1, 'version': 1}
+    )
+    return explain_failure(current, order_id, target, expected_status, expected_version)
+
+
+def transition_order(order_id, target, expected_status=None, expected_version=None):
+    """
+    Move an order to target with one conditional find_one_and_update.
+    Returns the updated order, raises OrderTransitionError otherwise.
+    """
+    target, query = transition_query(order_id, target, expected_status, expected_version)
+    order = dbconn.Orders.find_one_and_update(query, transition_update(target), return_document=ReturnDocument.AFTER)
+    if order is None:
+        raise failed_transition(order_id, target, expected_status, expected_version)
+    return order
+
+
+def serialize_status(order):
+    """Canonical status and version on an order going into a response"""
+    if 'status' in order:
+        order['status'] = normalize_status(order['status']) or order['status']
+    order['version'] = order.get('version', 0)
+    order.pop('transitionId', None)
+    return order
@@ -0,0 +1,38 @@
+DELIVERY_CHARGE = 50.00
+TAX_PERCENTAGE = 0.05
+
+
+def order_totals(subtotal):
+    """Delivery, tax and grand total for a cart or order subtotal"""
+    tax_amount = round(subtotal * TAX_PERCENTAGE, 2)
+    return {
+        'subtotal': subtotal,
+        'deliveryCharge': DELIVERY_CHARGE,
+        'taxPercentage': TAX_PERCENTAGE * 100,
+        'taxAmount': tax_amount,
+        'totalPrice': subtotal + DELIVERY_CHARGE + tax_amount
+    }
+
+
+def price_cart_items(cart_items, products_by_id):
+    """
+    Order line items for cart rows at current catalog prices, plus the
+    fkProductId of rows whose product is no longer available. Checkout and
+    the cart details both price through here, so the cart shows what
+    checkout will charge.
+    """
+    line_items = []
+    unavailable = []
+    for item in cart_items:
+        product = products_by_id.get(item['fkProductId'])
+        if not product:
+            unavailable.append(item['fkProductId'])
+            continue
+        line_items.append({
+            'fkProductId': item['fkProductId'],
+            'productName': product['name'],
+            'quantity': item['quantity'],
+            'unitPrice': product['price'],
+            'totalPrice': product['price'] * item['quantity']
+        })
+    return line_items, unavailable
@@ -0,0 +1,146 @@
+from time import time
+from threading import Lock
+from hashlib import sha256
+from django.conf import settings
+from django.core.cache import caches
+from CustomerApp.cache import TTLCache
+
+
+class DjangoCacheStore:
+    """Limiter state in a Django cache backend, shared by every process using it"""
+
+    def __init__(self, alias='default', prefix='login-limit'):
+        self.cache = caches[alias]
+        self.prefix = prefix
+
+    def get(self, key, default=None):
+        return self.cache.get(f'{self.prefix}:{key}', default)
+
+    def set(self, key, value, ttl=None):
+        self.cache.set(f'{self.prefix}:{key}', value, timeout=ttl)
+
+    def pop(self, key):
+        self.cache.delete(f'{self.prefix}:{key}')
+
+
+class LoginRateLimiter:
+    """
+    Throttle login attempts before any database or bcrypt work.
+
+    Each email and each client IP has a token bucket holding `burst`
+    attempts that refills over `period` seconds. Independently, an email
+    with `max_failures` failed logins inside the sliding `failure_window`
+    is locked until the oldest of those failures leaves the window.
+    State lives in a process-local TTLCache, or in any Django cache
+    (e.g. Redis) when it has to be shared between processes.
+    """
+
+    def __init__(self, store, email_burst=10, ip_burst=30, period=60,
+                 max_failures=5, failure_window=900):
+        self.store = store
+        self.email_burst = email_burst
+        self.ip_burst = ip_burst
+        self.period = period
+        self.max_failures = max_failures
+        self.failure_window = failure_window
+        # Serializes read-modify-write of the state within this process; a
+        # shared cache store is best effort across processes
+        self._state_lock = Lock()
+        self._lock = Lock()
+        self._metrics = {'allowed': 0, 'rejectedEmail': 0, 'rejectedIp': 0, 'rejectedLocked': 0, 'failures': 0}
+
+    def metrics(self):
+        """Counters of allowed, rejected and failed attempts in this process"""
+        with self._lock:
+            return dict(self._metrics)
+
+    def _count(self, name):
+        with self._lock:
+            self._metrics[name] += 1
+
+    def _take_token(self, key, burst, now):
+        """Consume one token from a bucket, returns seconds to wait or 0"""
+        with self._state_lock:
+            tokens, updated = self.store.get(key) or (burst, now)
+            tokens = min(burst, tokens + (now - updated) * burst / self.period)
+            if tokens < 1:
+                self.store.set(key, (tokens, now), ttl=self.period)
+                return (1 - tokens) * self.period / burst
+            self.store.set(key, (tokens - 1, now), ttl=self.period)
+            return 0
+
+    def check(self, email, ip):
+        """
+        Returns (allowed, retry_after_seconds). Call before looking up the
+        user so rejected attempts cost no database or bcrypt work.
+        """
+        now = time()
+        email_key = _key('email', email)
+
+        failures = self.store.get(f'fail:{email_key}') or ()
+        failures = tuple(t for t in failures if now - t < self.failure_window)
+        if len(failures) >= self.max_failures:
+            self._count('rejectedLocked')
+            return False, failures[0] + self.failure_window - now
+
+        wait = self._take_token(f'bucket:{email_key}', self.email_burst, now)
+        if wait:
+            self._count('rejectedEmail')
+            return False, wait
+        if ip:
+            wait = self._take_token(f'bucket:{_key("ip", ip)}', self.ip_burst, now)
+            if wait:
+                self._count('rejectedIp')
+                return False, wait
+
+        self._count('allowed')
+        return True, 0
+
+    def record_failure(self, email):
+        """Remember a failed login for the sliding failure window"""
+        now = time()
+        key = f'fail:{_key("email", email)}'
+        with self._state_lock:
+            failures = self.store.get(key) or ()
+            failures = tuple(t for t in failures if now - t < self.failure_window)
+            # Only the most recent max_failures timestamps matter
+            failures = (failures + (now,))[-self.max_failures:]
+            self.store.set(key, failures, ttl=self.failure_window)
+        self._count('failures')
+
+    def record_success(self, email):
+        """Clear the failure history after a successful login"""
+        self.store.pop(f'fail:{_key("email", email)}')
+
+
+def _key(kind, value):
+    """Hashed store key so raw emails and addresses are not kept around"""
+    return sha256(f'{kind}:{value}'.encode('utf-8')).hexdigest()[:32]
+
+
+def client_ip(req):
+    """Client address, taken from X-Forwarded-For only behind a trusted proxy"""
+    if getattr(settings, 'LOGIN_RATE_LIMIT_TRUST_X_FORWARDED_FOR', False):
+        forwarded = req.META.get('HTTP_X_FORWARDED_FOR', '')
+        if forwarded:
+            return forwarded.split(',')[0].strip()
+    return req.META.get('REMOTE_ADDR', '')
+
+
+def _build_store():
+    if getattr(settings, 'LOGIN_RATE_LIMIT_BACKEND', 'memory') == 'cache':
+        return DjangoCacheStore(getattr(settings, 'LOGIN_RATE_LIMIT_CACHE', 'default'))
+    return TTLCache(
+        ttl=max(getattr(settings, 'LOGIN_RATE_LIMIT_PERIOD', 60), getattr(settings, 'LOGIN_FAILURE_WINDOW', 900)),
+        max_size=getattr(settings, 'LOGIN_RATE_LIMIT_MAX_KEYS', 100000)
+    )
+
+
+login_limiter = LoginRateLimiter(
+    _build_store(),
+    email_burst=getattr(settings, 'LOGIN_RATE_LIMIT_EMAIL_BURST', 10),
+    ip_burst=getattr(settings, 'LOGIN_RATE_LIMIT_IP_BURST', 30),
+    period=getattr(settings, 'LOGIN_RATE_LIMIT_PERIOD', 60),
+    max_failures=getattr(settings, 'LOGIN_MAX_FAILURES', 5),
+    failure_window=getattr(settings, 'LOGIN_FAILURE_WINDOW', 900)
+)
@@ -0,0 +1,75 @@
+from re import compile, escape, IGNORECASE
+from zerasBurgerBackend.mongoConnection import db, read_db
+from CustomerApp.users import invalidate_user
+
+dbconn = db
+readconn = read_db
+
+ORDER_NUMBER_REGEX = compile(r'^(?:ON)?(\d+)$', IGNORECASE)
+ORDER_NUMBER_DIGITS = 5
+# Users registered before nameLower existed
+MISSING_NAME_LOWER = {'nameLower': {'$exists': False}, 'name': {'$type': 'string'}}
+
+
+def normalize_name(name):
+    """Lowercased, whitespace collapsed form of a name used for prefix search"""
+    return ' '.join(name.lower().split())
+
+
+def backfill_search_fields(dry_run=False):
+    """
+    Backfill nameLower on users registered before the field existed and
+    return how many users need (or got) it. Run by
+    `python manage.py ensure_indexes`, never on the request path; until
+    then such users are still found by the text search fallback.
+    """
+    if dry_run:
+        return dbconn.clnUsers.count_documents(MISSING_NAME_LOWER)
+    modified = dbconn.clnUsers.update_many(
+        MISSING_NAME_LOWER,
+        [{'$set': {'nameLower': {'$toLower': '$name'}}}]
+    ).modified_count
+    if modified:
+        invalidate_user()
+    return modified
+
+
+def find_customer_ids(query_str):
+    """
+    Ids of active users whose name matches the query. An anchored prefix on
+    the indexed nameLower field is tried first, then a text search so a
+    query can still match a later word of the name.
+    """
+    prefix = normalize_name(query_str)
+    if not prefix:
+        return []
+    users = list(readconn.clnUsers.find(
+        {'nameLower': {'$regex': '^' + escape(prefix)}, 'activeFlag': True},
+        projection={'_id': 1}
+    ))
+    if not users:
+        users = list(readconn.clnUsers.find(
+            {'$text': {'$search': query_str}, 'activeFlag': True},
+            projection={'_id': 1}
+        ))
+    return [u['_id'] for u in users]
+
+
+def plan_order_search(query_str):
+    """
+    Build the Orders filter for a search box query.
+
+    Input shaped like an order number (ON00042, on42, 42) is matched
+    exactly, a partial zero-padded one (ON000) as an anchored prefix of
+    orderNumber; anything else is treated as a customer name. Both paths use
+    an index, and user input is always escaped before it reaches $regex.
+    """
+    query_str = query_str.strip()
+    match = ORDER_NUMBER_REGEX.match(query_str)
+    if match:
+        digits = match.group(1)
+        # A zero-padded partial number (ON000) is still being typed
+        if digits.startswith('0') and len(digits) < ORDER_NUMBER_DIGITS:
+            return {'orderNumber': {'$regex': '^' + escape('ON' + digits)}}
+        return {'orderNumber': f"ON{int(digits):0{ORDER_NUMBER_DIGITS}d}"}
+    return {'fkUserId': {'$in': find_customer_ids(query_str)}}
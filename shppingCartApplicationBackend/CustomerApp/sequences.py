@@ -0,0 +1,92 @@
+import os
+from threading import Lock
+from pymongo import ReturnDocument
+from django.conf import settings
+from zerasBurgerBackend.mongoConnection import db
+
+dbconn = db
+
+
+class SequenceAllocator:
+    """
+    Atomic counter backed by the Counters collection.
+
+    Every call to `reserve` does a single find_one_and_update/$inc on the
+    counter document, so concurrent workers can never hand out the same
+    number. With block_size > 1 each process reserves a range of numbers at
+    once and serves allocations from memory until the range is used up
+    (numbers left unused when a worker exits are simply skipped).
+    """
+
+    def __init__(self, name, block_size=1, seed=None):
+        self.name = name
+        self.block_size = max(int(block_size), 1)
+        self.seed = seed
+        self._lock = Lock()
+        self._seeded = False
+        self._next = 0
+        self._block_end = -1
+        self._pid = os.getpid()
+
+    def _ensure_seeded(self):
+        """Make sure the counter starts after any number already in use"""
+        if self._seeded:
+            return
+        start = self.seed() if self.seed else 0
+        # $max is idempotent, so several workers seeding at once is harmless
+        dbconn.Counters.update_one(
+            {'_id': self.name},
+            {'$max': {'seq': start}},
+            upsert=True
+        )
+        self._seeded = True
+
+    def _reserve(self):
+        """Reserve the next block of numbers from the database"""
+        self._ensure_seeded()
+        counter = dbconn.Counters.find_one_and_update(
+            {'_id': self.name},
+            {'$inc': {'seq': self.block_size}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        self._block_end = counter['seq']
+        self._next = self._block_end - self.block_size + 1
+
+    def next(self):
+        """Return the next number of the sequence"""
+        with self._lock:
+            # A forked worker must not reuse the block reserved by its parent
+            if self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._block_end = -1
+            if self._next > self._block_end:
+                self._reserve()
+            value = self._next
+            self._next += 1
+            return value
+
+
+def _last_order_number():
+    """Numeric part of the most recent ON-prefixed order number, or 0"""
+    last_order = dbconn.Orders.find_one(
+        {}, sort=[("createdOn", -1)], projection={"orderNumber": 1}
+    )
+    if last_order and str(last_order.get("orderNumber", '')).startswith("ON"):
+        try:
+            return int(str(last_order["orderNumber"])[2:])
+        except Exception:
+            return 0
+    return 0
+
+
+order_number_allocator = SequenceAllocator(
+    'orderNumber',
+    block_size=getattr(settings, 'ORDER_NUMBER_BLOCK_SIZE', 1),
+    seed=_last_order_number
+)
+
+
+def next_order_number():
+    """Allocate the next order number, e.g. ON00042"""
+    return f"ON{order_number_allocator.next():05d}"
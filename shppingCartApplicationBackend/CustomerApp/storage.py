@@ -0,0 +1,191 @@
+import os
+import tempfile
+from io import BytesIO
+from uuid import uuid4
+from hashlib import sha256
+from posixpath import normpath
+from threading import Lock
+from django.conf import settings
+
+CONTENT_TYPES = {
+    'jpg': 'image/jpeg',
+    'png': 'image/png',
+    'gif': 'image/gif',
+    'webp': 'image/webp',
+}
+# A blob's name is its content hash, so its bytes never change
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+
+def blob_key(digest, ext):
+    """images/<first two hex digits>/<sha256>.<ext>"""
+    return f'images/{digest[:2]}/{digest}.{ext}'
+
+
+def valid_key(key):
+    """Relative, normalized key without hidden or parent components"""
+    if not key or key.startswith('/') or '\\' in key or normpath(key) != key:
+        return False
+    return not any(part.startswith('.') for part in key.split('/'))
+
+
+class LocalImageStore:
+    """
+    Content addressed blobs under a local directory (MEDIA_ROOT), served
+    from base_url. Writes go through a temp file and a rename, so a blob
+    is either absent or complete, and a blob already present is not
+    written again.
+    """
+
+    def __init__(self, root, base_url):
+        self.root = root
+        self.base_url = base_url
+
+    def path(self, key):
+        return os.path.join(self.root, *key.split('/'))
+
+    def url(self, key):
+        return f'{self.base_url}{key}'
+
+    def key_for_url(self, url):
+        """Key of a URL served by this store, None for anything else"""
+        if not url or not url.startswith(self.base_url):
+            return None
+        key = url[len(self.base_url):]
+        return key if valid_key(key) else None
+
+    def exists(self, key):
+        return os.path.isfile(self.path(key))
+
+    def open(self, key):
+        return open(self.path(key), 'rb')
+
+    def new_temp_path(self):
+        """Temp file on the same filesystem, so put_file is a rename"""
+        temp_dir = os.path.join(self.root, '.tmp')
+        os.makedirs(temp_dir, exist_ok=True)
+        return os.path.join(temp_dir, f'{uuid4().hex}.part')
+
+    def put_file(self, temp_path, digest, ext):
+        """Store a file whose sha256 is digest, consumes temp_path, returns the URL"""
+        key = blob_key(digest, ext)
+        path = self.path(key)
+        if os.path.isfile(path):
+            os.remove(temp_path)
+        else:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.replace(temp_path, path)
+        return self.url(key)
+
+    def put_bytes(self, data, ext):
+        digest = sha256(data).hexdigest()
+        key = blob_key(digest, ext)
+        if self.exists(key):
+            return self.url(key)
+        temp_path = self.new_temp_path()
+        with open(temp_path, 'wb') as f:
+            f.write(data)
+        return self.put_file(temp_path, digest, ext)
+
+
+class S3ImageStore:
+    """
+    Content addressed blobs in an S3 compatible bucket (AWS S3, MinIO, ...)
+    so several app nodes share media without a shared disk. Objects are
+    written with their content type and an immutable Cache-Control, and a
+    HEAD request skips uploading bytes the bucket already holds.
+    public_url is where the bucket root is served (endpoint/bucket by
+    default), object keys and so URLs include the prefix.
+    """
+
+    def __init__(self, bucket, prefix='', endpoint_url=None, region=None,
+                 access_key=None, secret_key=None, public_url=None):
+        self.bucket = bucket
+        self.prefix = f'{prefix.strip("/")}/' if prefix.strip('/') else ''
+        self.endpoint_url = endpoint_url
+        self.region = region
+        self.access_key = access_key
+        self.secret_key = secret_key
+        self.public_url = (public_url or f'{endpoint_url or "https://s3.amazonaws.com"}/{bucket}').rstrip('/') + '/'
+        self._lock = Lock()
+        self._client = None
+
+    def _s3(self):
+        """boto3 client, created once per (forked) worker process"""
+        with self._lock:
+            if self._client is None or self._client[0] != os.getpid():
+                import boto3
+                from botocore.config import Config
+                client = boto3.client(
+                    's3',
+                    endpoint_url=self.endpoint_url,
+                    region_name=self.region,
+                    aws_access_key_id=self.access_key,
+                    aws_secret_access_key=self.secret_key,
+                    # MinIO and most stand-ins only do path style addressing
+                    config=Config(s3={'addressing_style': 'path' if self.endpoint_url else 'auto'})
+                )
+                self._client = (os.getpid(), client)
+            return self._client[1]
+
+    def url(self, key):
+        return f'{self.public_url}{self.prefix}{key}'
+
+    def key_for_url(self, url):
+        base = self.public_url + self.prefix
+        if not url or not url.startswith(base):
+            return None
+        key = url[len(base):]
+        return key if valid_key(key) else None
+
+    def exists(self, key):
+        from botocore.exceptions import ClientError
+        try:
+            self._s3().head_object(Bucket=self.bucket, Key=self.prefix + key)
+            return True
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') in ('404', 'NoSuchKey', 'NotFound'):
+                return False
+            raise
+
+    def open(self, key):
+        response = self._s3().get_object(Bucket=self.bucket, Key=self.prefix + key)
+        return BytesIO(response['Body'].read())
+
+    def new_temp_path(self):
+        return os.path.join(tempfile.gettempdir(), f'image-upload-{uuid4().hex}.part')
+
+    def _extra_args(self, ext):
+        return {'ContentType': CONTENT_TYPES.get(ext, 'application/octet-stream'), 'CacheControl': IMMUTABLE_CACHE_CONTROL}
+
+    def put_file(self, temp_path, digest, ext):
+        key = blob_key(digest, ext)
+        try:
+            if not self.exists(key):
+                self._s3().upload_file(temp_path, self.bucket, self.prefix + key, ExtraArgs=self._extra_args(ext))
+        finally:
+            os.remove(temp_path)
+        return self.url(key)
+
+    def put_bytes(self, data, ext):
+        key = blob_key(sha256(data).hexdigest(), ext)
+        if not self.exists(key):
+            self._s3().put_object(Bucket=self.bucket, Key=self.prefix + key, Body=data, **self._extra_args(ext))
+        return self.url(key)
+
+
+def _build_store():
+    if getattr(settings, 'IMAGE_STORE_BACKEND', 'local') == 's3':
+        return S3ImageStore(
+            bucket=settings.IMAGE_STORE_S3_BUCKET,
+            prefix=getattr(settings, 'IMAGE_STORE_S3_PREFIX', ''),
+            endpoint_url=getattr(settings, 'IMAGE_STORE_S3_ENDPOINT_URL', None),
+            region=getattr(settings, 'IMAGE_STORE_S3_REGION', None),
+            access_key=getattr(settings, 'IMAGE_STORE_S3_ACCESS_KEY', None),
+            secret_key=getattr(settings, 'IMAGE_STORE_S3_SECRET_KEY', None),
+            public_url=getattr(settings, 'IMAGE_STORE_PUBLIC_URL', None)
+        )
+    return LocalImageStore(settings.MEDIA_ROOT, settings.MEDIA_URL)
+
+
+image_store = _build_store()
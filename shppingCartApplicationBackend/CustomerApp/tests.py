@@ -1,3 +1,144 @@
-from django.test import TestCase
+import asyncio
+from unittest import mock
+from django.test import SimpleTestCase
+from bson.objectid import ObjectId
+from zerasBurgerBackend import mongoConnection
+from CustomerApp import search, users, utils
+from CustomerApp.catalog import CatalogCache
+from CustomerApp.storage import S3ImageStore
+from CustomerApp.views.product import cart_item_update
 
-# Create your tests here.
+
+class FakeAsyncClient:
+    """Stands in for pymongo.AsyncMongoClient, records close()"""
+
+    closed = []
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def __getitem__(self, name):
+        return self
+
+    def get_database(self, name, **kwargs):
+        return self
+
+    async def close(self):
+        FakeAsyncClient.closed.append(self)
+
+
+class AsyncClientPerLoopTests(SimpleTestCase):
+
+    def setUp(self):
+        FakeAsyncClient.closed = []
+        patcher = mock.patch('pymongo.AsyncMongoClient', FakeAsyncClient)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_one_client_per_loop(self):
+        async def view():
+            return mongoConnection.get_async_db() is mongoConnection.get_async_read_db()
+
+        self.assertTrue(asyncio.run(view()))
+
+    def test_clients_closed_and_forgotten_with_their_loop(self):
+        async def view():
+            mongoConnection.get_async_db()
+            await asyncio.sleep(0)
+            return len(FakeAsyncClient.closed)
+
+        closed_during_requests = [asyncio.run(view()) for _ in range(5)]
+
+        self.assertEqual(closed_during_requests, [0, 1, 2, 3, 4])
+        self.assertEqual(len(FakeAsyncClient.closed), 5)
+        self.assertEqual(mongoConnection._async_clients, {})
+
+
+class CartItemUpdateTests(SimpleTestCase):
+    product = {'_id': ObjectId(), 'name': '$5 Meal', 'price': 5, 'imageUrl': '$$ROOT'}
+
+    def test_product_values_are_literals(self):
+        fields = cart_item_update(self.product, 2)[0]['$set']
+
+        self.assertEqual(fields['productName'], {'$ifNull': ['$productName', {'$literal': '$5 Meal'}]})
+        self.assertEqual(fields['productImageUrl'], {'$ifNull': ['$productImageUrl', {'$literal': '$$ROOT'}]})
+        self.assertEqual(fields['unitPrice'], {'$literal': 5})
+        self.assertEqual(fields['quantity'], {'$add': [{'$ifNull': ['$quantity', 0]}, {'$literal': 2}]})
+
+    def test_replace_sets_literal_quantity(self):
+        fields = cart_item_update(self.product, 3, replace=True)[0]['$set']
+
+        self.assertEqual(fields['quantity'], {'$literal': 3})
+        self.assertEqual(fields['totalPrice'], {'$multiply': [{'$literal': 3}, {'$literal': 5}]})
+
+
+class S3ImageStorePrefixTests(SimpleTestCase):
+
+    def setUp(self):
+        self.store = S3ImageStore('media', prefix='/shop-a/', endpoint_url='http://localhost:9000')
+
+    def test_url_points_at_the_prefixed_object(self):
+        s3 = mock.Mock()
+        with mock.patch.object(self.store, '_s3', return_value=s3), \
+                mock.patch.object(self.store, 'exists', return_value=False):
+            url = self.store.put_bytes(b'image', 'png')
+
+        key = s3.put_object.call_args.kwargs['Key']
+        self.assertTrue(key.startswith('shop-a/images/'))
+        self.assertEqual(url, 'http://localhost:9000/media/' + key)
+
+    def test_key_for_url_strips_the_prefix(self):
+        key = 'images/ab/' + 'ab' * 32 + '.png'
+
+        self.assertEqual(self.store.key_for_url(self.store.url(key)), key)
+        self.assertIsNone(self.store.key_for_url('http://localhost:9000/media/' + key))
+
+
+class UserCacheInvalidationTests(SimpleTestCase):
+
+    def setUp(self):
+        users.user_cache.clear()
+        self.user_id = ObjectId()
+        users.user_cache.set(self.user_id, {'_id': self.user_id, 'activeFlag': True})
+
+    def test_password_rehash_drops_the_cached_user(self):
+        with mock.patch.object(utils, 'dbconn'), \
+                mock.patch.object(utils, '_hash_password', return_value='hash'), \
+                mock.patch.object(utils, '_submit_password_job', side_effect=lambda job: job()):
+            utils.rehash_password_in_background(self.user_id, 'secret')
+
+        self.assertIsNone(users.user_cache.get(self.user_id))
+
+    def test_search_backfill_drops_every_cached_user(self):
+        with mock.patch.object(search, 'dbconn') as dbconn:
+            dbconn.clnUsers.update_many.return_value.modified_count = 3
+            search.backfill_search_fields()
+
+        self.assertEqual(len(users.user_cache), 0)
+
+
+class OversizedCatalogTests(SimpleTestCase):
+
+    def setUp(self):
+        self.cache = CatalogCache(ttl=60, max_size=1)
+        self.db = mock.Mock()
+        self.db.Products.find.return_value = [{'_id': ObjectId()}, {'_id': ObjectId()}]
+        patcher = mock.patch.object(self.cache, 'source', return_value=self.db)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def render(self, products):
+        return str(len(products)).encode()
+
+    def test_one_query_per_ttl(self):
+        responses = {self.cache.rendered(self.render) for _ in range(5)}
+
+        self.assertEqual(len(responses), 1)
+        self.assertEqual(self.db.Products.find.call_count, 1)
+
+    def test_invalidate_loads_again(self):
+        self.cache.rendered(self.render)
+        self.cache.invalidate()
+        self.cache.rendered(self.render)
+
+        self.assertEqual(self.db.Products.find.call_count, 2)
@@ -0,0 +1,109 @@
+import os
+import json
+import jwt
+from time import monotonic
+from threading import Lock
+from traceback import format_exc
+from datetime import datetime, timedelta
+from django.conf import settings
+
+# Tokens issued before key ids existed carry no kid header
+DEFAULT_KID = 'default'
+
+
+class SigningKey:
+    """Key material prepared once for signing and verifying"""
+
+    def __init__(self, kid, secret, algorithm):
+        self.kid = kid
+        self.algorithm = algorithm
+        algorithm_obj = jwt.get_algorithm_by_name(algorithm)
+        self.signing_key = algorithm_obj.prepare_key(secret)
+        # Asymmetric keys are configured as private keys, verify with the public half
+        public_key = getattr(self.signing_key, 'public_key', None)
+        self.verifying_key = public_key() if callable(public_key) else self.signing_key
+
+
+class TokenService:
+    """
+    Issues and verifies JWTs with keys prepared once at startup.
+
+    Keys come from JWT_SECRET_KEY/JWT_ALGORITHM (kid "default") and,
+    optionally, a JSON keys file:
+        {"algorithm": "HS256", "activeKid": "2025-11",
+         "keys": {"2025-11": "<secret>", "default": "<old secret>"}}
+    New tokens are signed with the active key and carry its kid; any key
+    still listed can verify. The file is re-read when it changes (checked
+    at most every reload_interval seconds), so keys rotate without a
+    restart: add the new key and make it active, then drop the old one
+    once its tokens have expired. The environment key keeps verifying as
+    kid "default" unless the file lists its own "default" entry.
+    """
+
+    def __init__(self, secret, algorithm='HS256', expiration_hours=24, keys_file=None, reload_interval=30):
+        self.expiration = timedelta(hours=expiration_hours)
+        self.keys_file = keys_file
+        self.reload_interval = reload_interval
+        self._jwt = jwt.PyJWT()
+        self._lock = Lock()
+        self._env_key = SigningKey(DEFAULT_KID, secret, algorithm)
+        self._keys = {DEFAULT_KID: self._env_key}
+        self._active = self._env_key
+        self._keys_mtime = None
+        self._next_check = 0
+        self.key_version = 0
+        self.refresh()
+
+    def refresh(self):
+        """Load the keys file when it changed since the last check"""
+        if not self.keys_file:
+            return
+        now = monotonic()
+        if now < self._next_check:
+            return
+        with self._lock:
+            if now < self._next_check:
+                return
+            self._next_check = now + self.reload_interval
+            try:
+                mtime = os.path.getmtime(self.keys_file)
+                if mtime == self._keys_mtime:
+                    return
+                with open(self.keys_file) as f:
+                    config = json.load(f)
+                algorithm = config.get('algorithm', self._env_key.algorithm)
+                keys = {kid: SigningKey(kid, secret, algorithm) for kid, secret in config['keys'].items()}
+                keys.setdefault(DEFAULT_KID, self._env_key)
+                active = keys[config.get('activeKid', DEFAULT_KID)]
+            except Exception:
+                # Keep serving with the keys we already have
+                print(format_exc())
+                return
+            self._keys, self._active, self._keys_mtime = keys, active, mtime
+            self.key_version += 1
+
+    def issue(self, claims, expiration=None):
+        """Signed token for claims, exp (now + expiration) and iat are added here"""
+        self.refresh()
+        now = datetime.utcnow()
+        payload = dict(claims, exp=now + (expiration or self.expiration), iat=now)
+        key = self._active
+        return self._jwt.encode(payload, key.signing_key, algorithm=key.algorithm, headers={'kid': key.kid})
+
+    def verify(self, token):
+        """Decoded claims, raises jwt.InvalidTokenError subclasses on failure"""
+        self.refresh()
+        kid = jwt.get_unverified_header(token).get('kid', DEFAULT_KID)
+        key = self._keys.get(kid)
+        if key is None:
+            raise jwt.InvalidTokenError('Unknown signing key')
+        return self._jwt.decode(token, key.verifying_key, algorithms=[key.algorithm])
+
+
+token_service = TokenService(
+    secret=os.getenv('JWT_SECRET_KEY', 'a560237226dc146102e735671313dd863adff7e3e4ba8404db0428891c027065'),
+    algorithm=os.getenv('JWT_ALGORITHM', 'HS256'),
+    expiration_hours=int(os.getenv('JWT_EXPIRATION_HOURS', 24)),
+    keys_file=getattr(settings, 'JWT_KEYS_FILE', None),
+    reload_interval=getattr(settings, 'JWT_KEYS_RELOAD_INTERVAL', 30)
+)
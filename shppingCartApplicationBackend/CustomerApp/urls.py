@@ -5,15 +5,19 @@ from django.urls import path
 
 # customer = CustomerProfile.as_view()
 from CustomerApp.views.auth import (RegisterUser, LoginUser)
-from CustomerApp.views.product import (CreateProduct, GetProducts, GetSpecificProduct,
-    AddToCart, ProductRemoveFromCart, GetUserCartDetails)
-from CustomerApp.views.orders import (CreateOrder, SearchUserOrder, GetSpecificOrderUser, UpdateUserOrder, RemovedUserOrder)
+from CustomerApp.views.product import (CreateProduct, UploadProductImage, GetProducts, GetSpecificProduct,
+    AddToCart, ProductRemoveFromCart, GetUserCartDetails, CartBatchUpdate)
+from CustomerApp.views.orders import (CreateOrder, CheckoutCart, SearchUserOrder, GetSpecificOrderUser, UpdateUserOrder,
+    BatchUpdateUserOrders, RemovedUserOrder)
+from CustomerApp.views.health import MongoPoolStats, LoginLimiterStats
+from CustomerApp.views import async_views
 urlpatterns = [
     path("auth/register", RegisterUser.as_view(), name="auth-register"),
     path("auth/login", LoginUser.as_view(), name="auth-login"),
 
     # product
     path("product/product-creation", CreateProduct.as_view(), name="product-creation"),
+    path("product/image-upload", UploadProductImage.as_view(), name="product-image-upload"),
     path("product/products", GetProducts.as_view(), name="products"),
     path("product/specif-product", GetSpecificProduct.as_view(), name="specif-product"),
 
@@ -21,11 +25,29 @@ urlpatterns = [
     path("product/cart/add", AddToCart.as_view(), name="cart-add"),
     path("product/cart/remove", ProductRemoveFromCart.as_view(), name="cart-remove"),
     path("product/cart/details", GetUserCartDetails.as_view(), name="cart-details"),
+    path("product/cart/batch", CartBatchUpdate.as_view(), name="cart-batch"),
+    path("product/cart/checkout", CheckoutCart.as_view(), name="cart-checkout"),
 
     # orders
     path("order/create", CreateOrder.as_view(), name="order-create"),
     path("order/search", SearchUserOrder.as_view(), name="order-search"),
     path("order/details", GetSpecificOrderUser.as_view(), name="order-details"),
     path("order/update", UpdateUserOrder.as_view(), name="order-update"),
+    path("order/update/batch", BatchUpdateUserOrders.as_view(), name="order-update-batch"),
     path("order/remove", RemovedUserOrder.as_view(), name="order-remove"),
+
+    # health
+    path("health/mongo-pool", MongoPoolStats.as_view(), name="health-mongo-pool"),
+    path("health/login-limiter", LoginLimiterStats.as_view(), name="health-login-limiter"),
+
+    # async variants, serve through asgi.py
+    path("async/product/products", async_views.products, name="async-products"),
+    path("async/product/specif-product", async_views.specific_product, name="async-specif-product"),
+    path("async/product/cart/add", async_views.add_to_cart, name="async-cart-add"),
+    path("async/product/cart/remove", async_views.remove_from_cart, name="async-cart-remove"),
+    path("async/product/cart/details", async_views.cart_details, name="async-cart-details"),
+    path("async/order/create", async_views.create_order, name="async-order-create"),
+    path("async/order/details", async_views.order_details, name="async-order-details"),
+    path("async/order/events", async_views.order_events, name="async-order-events"),
+    path("async/order/events/token", async_views.order_events_token, name="async-order-events-token"),
 ]
@@ -0,0 +1,41 @@
+from django.conf import settings
+from zerasBurgerBackend.mongoConnection import db
+from CustomerApp.cache import TTLCache
+
+dbconn = db
+
+# Never keep password hashes in the process cache
+USER_PROJECTION = {'password': 0}
+
+user_cache = TTLCache(
+    ttl=getattr(settings, 'USER_CACHE_TTL', 30),
+    max_size=getattr(settings, 'USER_CACHE_MAX_SIZE', 10000)
+)
+
+
+def get_active_user(user_id):
+    """
+    Active user document for an ObjectId, served from a short-lived
+    process cache. Returns None for unknown or deactivated users.
+    """
+    user = user_cache.get(user_id)
+    if user is None:
+        user = dbconn.clnUsers.find_one({'_id': user_id}, projection=USER_PROJECTION)
+        if not user:
+            return None
+        user_cache.set(user_id, user)
+    if not user.get('activeFlag', False):
+        return None
+    return user
+
+
+def invalidate_user(user_id=None):
+    """
+    Drop a cached user (or every cached user) after a write to clnUsers.
+    Only reaches this process, other workers see the change once their
+    entry expires (USER_CACHE_TTL).
+    """
+    if user_id is None:
+        user_cache.clear()
+    else:
+        user_cache.pop(user_id)
@@ -1,14 +1,32 @@
 import re
 import jwt
 import bcrypt
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
+from hashlib import sha256
 import os
 from functools import wraps
+from threading import BoundedSemaphore
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 from django.http import JsonResponse
 from zerasBurgerBackend.mongoConnection import db
 from bson.objectid import ObjectId
+from django.conf import settings
+from CustomerApp.cache import TTLCache
+from CustomerApp.users import get_active_user, invalidate_user
+from CustomerApp.tokens import token_service
 dbconn = db
 
+_password_pool = None
+
+# purpose claim of the tokens that open the order event stream
+ORDER_EVENTS_PURPOSE = 'order-events'
+
+# Verified JWT claims keyed by token hash, entries expire with the token
+_jwt_claims_cache = TTLCache(
+    ttl=int(os.getenv('JWT_EXPIRATION_HOURS', 24)) * 3600,
+    max_size=getattr(settings, 'JWT_CLAIMS_CACHE_SIZE', 10000)
+)
+
 EMAIL_REGEX = re.compile(
     r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
 )
@@ -53,52 +71,162 @@ def validate_name(name):
     return True, formatted_name, "Valid name"
 
 
+class PasswordHasherBusy(Exception):
+    """Raised when the password hashing queue is full or too slow to answer"""
+
+
+def _password_executor():
+    """
+    Bounded pool that runs every bcrypt call, created once per (forked)
+    worker process. A semaphore caps running plus queued jobs so a burst of
+    logins is rejected early instead of tying up every request thread.
+    """
+    global _password_pool
+    if _password_pool is None or _password_pool[0] != os.getpid():
+        workers = getattr(settings, 'PASSWORD_HASH_WORKERS', 2)
+        queue_depth = getattr(settings, 'PASSWORD_HASH_QUEUE_DEPTH', 8)
+        _password_pool = (
+            os.getpid(),
+            ThreadPoolExecutor(max_workers=workers, thread_name_prefix='bcrypt'),
+            BoundedSemaphore(workers + queue_depth)
+        )
+    return _password_pool[1], _password_pool[2]
+
+
+def _submit_password_job(func, *args):
+    """Queue func on the bcrypt pool, PasswordHasherBusy when it is full"""
+    executor, slots = _password_executor()
+    if not slots.acquire(blocking=False):
+        raise PasswordHasherBusy()
+    try:
+        future = executor.submit(func, *args)
+    except Exception:
+        slots.release()
+        raise
+    future.add_done_callback(lambda _: slots.release())
+    return future
+
+
+def _hash_password(password):
+    rounds = getattr(settings, 'BCRYPT_ROUNDS', 12)
+    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds=rounds)).decode('utf-8')
+
+
+def _verify_password(password, hashed_password):
+    return bcrypt.checkpw(password.encode('utf-8'), hashed_password.encode('utf-8'))
+
+
+def _password_job_result(future):
+    """Wait up to PASSWORD_HASH_TIMEOUT, a slow pool is PasswordHasherBusy too"""
+    try:
+        return future.result(timeout=getattr(settings, 'PASSWORD_HASH_TIMEOUT', 10))
+    except FutureTimeoutError:
+        # Drop the job if it has not started, nobody waits for it any more
+        future.cancel()
+        raise PasswordHasherBusy()
+
+
 def hash_password(password):
-    """Hash password using bcrypt"""
-    salt = bcrypt.gensalt()
-    hashed = bcrypt.hashpw(password.encode('utf-8'), salt)
-    return hashed.decode('utf-8')
+    """Hash password using bcrypt with the configured cost (BCRYPT_ROUNDS)"""
+    return _password_job_result(_submit_password_job(_hash_password, password))
 
 
 def verify_password(password, hashed_password):
     """Verify password against hashed password"""
-    return bcrypt.checkpw(password.encode('utf-8'), hashed_password.encode('utf-8'))
+    return _password_job_result(_submit_password_job(_verify_password, password, hashed_password))
+
+
+def password_needs_rehash(hashed_password):
+    """True when a bcrypt hash was made with a cost other than BCRYPT_ROUNDS"""
+    try:
+        cost = int(hashed_password.split('$')[2])
+    except (IndexError, ValueError):
+        return True
+    return cost != getattr(settings, 'BCRYPT_ROUNDS', 12)
+
+
+def rehash_password_in_background(user_id, password):
+    """
+    Store a hash with the configured cost for a user whose password was just
+    verified. Runs on the bcrypt pool without blocking the login; when the
+    pool is busy it is simply tried again on the next login.
+    """
+    def rehash():
+        dbconn.clnUsers.update_one({'_id': user_id}, {'$set': {'password': _hash_password(password)}})
+        invalidate_user(user_id)
+
+    try:
+        _submit_password_job(rehash)
+    except PasswordHasherBusy:
+        pass
 
 
 def generate_jwt_token(user_id, email, role):
-    """Generate JWT token"""
-    jwt_secret = os.getenv('JWT_SECRET_KEY', 'a560237226dc146102e735671313dd863adff7e3e4ba8404db0428891c027065')
-    jwt_algorithm = os.getenv('JWT_ALGORITHM', 'HS256')
-    expiration_hours = int(os.getenv('JWT_EXPIRATION_HOURS', 24))
-    
-    payload = {
+    """Generate JWT token signed with the active key"""
+    return token_service.issue({
         'user_id': str(user_id),
         'email': email,
-        'role': role,
-        'exp': datetime.utcnow() + timedelta(hours=expiration_hours),
-        'iat': datetime.utcnow()
-    }
-    
-    token = jwt.encode(payload, jwt_secret, algorithm=jwt_algorithm)
-    return token
+        'role': role
+    })
 
 
-def decode_jwt_token(token):
-    """Decode and verify JWT token"""
+def generate_stream_token(user_id):
+    """
+    Short-lived token that only opens the order event stream. EventSource
+    cannot send headers, so this goes in the URL instead of the login token.
+    """
+    return token_service.issue({
+        'user_id': str(user_id),
+        'purpose': ORDER_EVENTS_PURPOSE
+    }, expiration=timedelta(seconds=getattr(settings, 'ORDER_EVENTS_TOKEN_SECONDS', 60)))
+
+
+def decode_jwt_token(token, purpose=None):
+    """
+    Decode and verify JWT token. Login tokens carry no purpose claim,
+    single-purpose tokens are only valid where that purpose is expected.
+    """
     try:
-        jwt_secret = os.getenv('JWT_SECRET_KEY', 'a560237226dc146102e735671313dd863adff7e3e4ba8404db0428891c027065')
-        jwt_algorithm = os.getenv('JWT_ALGORITHM', 'HS256')
-        
-        payload = jwt.decode(token, jwt_secret, algorithms=[jwt_algorithm])
-        return True, payload
+        payload = token_service.verify(token)
     except jwt.ExpiredSignatureError:
         return False, "Token has expired"
     except jwt.InvalidTokenError:
         return False, "Invalid token"
+    if payload.get('purpose') != purpose:
+        return False, "Invalid token"
+    return True, payload
+
+
+def verify_stream_token(token):
+    """Verify a token from generate_stream_token, never cached"""
+    return decode_jwt_token(token, purpose=ORDER_EVENTS_PURPOSE)
+
+
+def verify_jwt_token(token):
+    """
+    Decode a token once and reuse the verified claims until the token
+    expires. Cache keys are token hashes, never the raw token.
+    """
+    key = sha256(token.encode('utf-8')).hexdigest()
+    token_service.refresh()
+    cached = _jwt_claims_cache.get(key)
+    # Claims verified before a key rotation are checked again
+    if cached is not None and cached[0] == token_service.key_version:
+        return True, cached[1]
+
+    is_valid, payload = decode_jwt_token(token)
+    if is_valid:
+        remaining = payload.get('exp', 0) - datetime.now(timezone.utc).timestamp()
+        if remaining > 0:
+            _jwt_claims_cache.set(key, (token_service.key_version, payload), ttl=remaining)
+    return is_valid, payload
 
 
 def jwt_required(view_func):
-    """Decorator to protect views with JWT authentication"""
+    """
+    Decorator to protect views with JWT authentication. Use with
+    method_decorator(jwt_required, name='post') on APIView classes.
+    """
     @wraps(view_func)
     def wrapper(request, *args, **kwargs):
         # Get token from Authorization header
@@ -112,8 +240,8 @@ def jwt_required(view_func):
         
         token = auth_header.split(' ')[1]
         
-        # Decode token
-        is_valid, payload = decode_jwt_token(token)
+        # Decode token (cached per token until it expires)
+        is_valid, payload = verify_jwt_token(token)
         
         if not is_valid:
             return JsonResponse({
@@ -121,8 +249,9 @@ def jwt_required(view_func):
                 'message': payload
             })
         
-        # Get user from database
-        user = dbconn.clnUsers.find_one({'_id': ObjectId(payload['userLoginId'])})
+        # Get user from the short-lived user cache
+        user_id = payload.get('user_id')
+        user = get_active_user(ObjectId(user_id)) if ObjectId.is_valid(user_id) else None
         
         if not user:
             return JsonResponse({
@@ -135,4 +264,37 @@ def jwt_required(view_func):
         
         return view_func(request, *args, **kwargs)
     
-    return wrapper
\ No newline at end of file
+    return wrapper
+
+
+def is_admin(user):
+    return user.get('role') == 'admin'
+
+
+def admin_required(view_func):
+    """
+    Decorator for admin only views, applied after jwt_required:
+        @method_decorator(jwt_required, name='post')
+        @method_decorator(admin_required, name='post')
+    """
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        if not is_admin(request.userLoginObj):
+            return JsonResponse({
+                'statusCode': 403,
+                'message': 'Admin access required'
+            })
+        return view_func(request, *args, **kwargs)
+
+    return wrapper
+
+
+def request_user_id(request, claimed_id=None):
+    """
+    _id of the logged in user (request.userLoginObj, set by jwt_required).
+    None when the payload names another user, which views answer with 403.
+    """
+    user_id = request.userLoginObj['_id']
+    if claimed_id and str(claimed_id) != str(user_id):
+        return None
+    return user_id
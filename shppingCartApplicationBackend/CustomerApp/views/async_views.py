@@ -0,0 +1,489 @@
+"""
+Async versions of the catalog, cart and order endpoints for the ASGI
+entry point (zerasBurgerBackend/asgi.py), mounted under /api/async/.
+They take the same payloads and return the same responses as the
+APIView classes, but every Mongo call goes through PyMongo's
+AsyncMongoClient so a waiting request does not hold a thread.
+"""
+import asyncio
+from json import loads
+from datetime import datetime
+from functools import wraps
+from traceback import format_exc
+from asgiref.sync import sync_to_async
+from bson.objectid import ObjectId
+from django.conf import settings
+from django.http import JsonResponse, HttpResponse, StreamingHttpResponse
+from django.utils.http import parse_etags
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET, require_POST
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from zerasBurgerBackend.mongoConnection import get_async_db, get_async_read_db
+from CustomerApp.catalog import catalog_cache, serialize_product, missing_products_query, ACTIVE_PRODUCTS_QUERY
+from CustomerApp.users import user_cache, USER_PROJECTION
+from CustomerApp.utils import (generate_stream_token, is_admin, request_user_id, verify_jwt_token,
+                               verify_stream_token)
+from CustomerApp.pricing import order_totals, price_cart_items
+from CustomerApp.sequences import next_order_number
+from CustomerApp.order_states import serialize_status
+from CustomerApp.events import ALL_ORDERS, order_broker, publish_order_event, user_channel
+from CustomerApp.views.product import GetProducts, cart_item_update
+from CustomerApp.views.orders import build_order, order_created_data, ORDER_NUMBER_RETRIES
+
+
+async def get_active_user(adb, user_id):
+    """Async counterpart of CustomerApp.users.get_active_user, same cache"""
+    user = user_cache.get(user_id)
+    if user is None:
+        user = await adb.clnUsers.find_one({'_id': user_id}, projection=USER_PROJECTION)
+        if not user:
+            return None
+        user_cache.set(user_id, user)
+    if not user.get('activeFlag', False):
+        return None
+    return user
+
+
+def catalog_db():
+    """Async counterpart of CatalogCache.source"""
+    return get_async_db() if catalog_cache.reads_primary else get_async_read_db()
+
+
+async def active_products():
+    """Active catalog from the cache, loaded asynchronously when stale"""
+    version = catalog_cache.version
+    fresh, products = catalog_cache.snapshot()
+    if not fresh or products is None:
+        products = await catalog_db().Products.find(ACTIVE_PRODUCTS_QUERY).to_list(None)
+        if not fresh:
+            catalog_cache.prime(products, version)
+    return products
+
+
+async def get_products(product_ids, active_only=True):
+    """Async counterpart of CatalogCache.get_products"""
+    version = catalog_cache.version
+    fresh, _ = catalog_cache.snapshot()
+    if not fresh:
+        catalog_cache.prime(await catalog_db().Products.find(ACTIVE_PRODUCTS_QUERY).to_list(None), version)
+    found, missing = catalog_cache.cached_products(product_ids, active_only)
+    if missing:
+        fetched = await catalog_db().Products.find(missing_products_query(missing, active_only)).to_list(None)
+        found.update(catalog_cache.remember(fetched))
+    return found
+
+
+async def authenticate(token, verify=verify_jwt_token):
+    """(user, None) for a valid token of an active user, else (None, message)"""
+    if not token:
+        return None, 'No token provided'
+    is_valid, payload = verify(token)
+    if not is_valid:
+        return None, payload
+    user_id = payload.get('user_id')
+    user = await get_active_user(get_async_db(), ObjectId(user_id)) if ObjectId.is_valid(user_id) else None
+    if not user:
+        return None, 'User not found'
+    return user, None
+
+
+def async_jwt_required(view_func):
+    """Async counterpart of CustomerApp.utils.jwt_required"""
+    @wraps(view_func)
+    async def wrapper(request, *args, **kwargs):
+        auth_header = request.headers.get('Authorization', '')
+        token = auth_header.split(' ')[1] if auth_header.startswith('Bearer ') else None
+        user, message = await authenticate(token)
+        if not user:
+            return JsonResponse({
+                'statusCode': 401,
+                'message': message
+            })
+
+        request.userLoginObj = user
+        return await view_func(request, *args, **kwargs)
+
+    return wrapper
+
+
+@require_GET
+async def products(req):
+    """
+    Async GetProducts
+    GET /api/async/product/products
+    """
+    try:
+        body, etag = (catalog_cache.cached_render()
+                      or catalog_cache.render_products(await active_products(), GetProducts.render_products))
+        if_none_match = parse_etags(req.headers.get('If-None-Match', ''))
+        if etag in if_none_match or '*' in if_none_match:
+            response = HttpResponse(status=304)
+        else:
+            response = HttpResponse(body, content_type='application/json')
+        response['ETag'] = etag
+        response['Cache-Control'] = 'no-cache'
+        return response
+    except Exception:
+        print(format_exc())
+        return JsonResponse({'statusCode': 500, 'message': 'Internal server error'})
+
+
+@csrf_exempt
+@require_POST
+async def specific_product(req):
+    """
+    Async GetSpecificProduct
+    POST /api/async/product/specif-product
+    Payload: { "_id": string }
+    """
+    try:
+        data = loads(req.body)
+        if '_id' not in data or not data['_id']:
+            return JsonResponse({'statusCode': 400, 'message': 'Product ID is required'}, status=400)
+
+        product_id = ObjectId(data['_id'])
+        product = (await get_products([product_id], active_only=False)).get(product_id)
+        if not product:
+            return JsonResponse({'statusCode': 404, 'message': 'Product not found'}, status=404)
+
+        return JsonResponse({
+            'statusCode': 200,
+            'message': 'Product retrieved successfully',
+            'data': serialize_product(product)
+        })
+    except Exception:
+        print(format_exc())
+        return JsonResponse({'statusCode': 500, 'message': 'Internal server error'})
+
+
+@csrf_exempt
+@require_POST
+@async_jwt_required
+async def add_to_cart(req):
+    """
+    Async AddToCart
+    POST /api/async/product/cart/add
+    Payload: { "fkUserId": string, "fkProductId": string, "quantity": int }
+    """
+    try:
+        data = loads(req.body)
+        fk_user_id = request_user_id(req, data.get('fkUserId'))
+        if fk_user_id is None:
+            return JsonResponse({'statusCode': 403, 'message': 'Not allowed for this user'})
+        if 'fkProductId' not in data or not data['fkProductId']:
+            return JsonResponse({'statusCode': 400, 'message': 'Product is required'})
+
+        adb = get_async_db()
+        fk_product_id = ObjectId(data['fkProductId'])
+
+        if not await get_active_user(adb, fk_user_id):
+            return JsonResponse({'statusCode': 404, 'message': 'User not found'})
+
+        product = (await get_products([fk_product_id])).get(fk_product_id)
+        if not product:
+            return JsonResponse({'statusCode': 404, 'message': 'Product not found'})
+
+        quantity = data.get('quantity', 1)
+        if not isinstance(quantity, int) or quantity < 1:
+            return JsonResponse({'statusCode': 400, 'message': 'Quantity must be a positive integer'})
+
+        query = {'fkUserId': fk_user_id, 'fkProductId': fk_product_id, 'activeFlag': True}
+        update = cart_item_update(product, quantity)
+        try:
+            cart_item = await adb.Cart.find_one_and_update(query, update, upsert=True, return_document=ReturnDocument.AFTER)
+        except DuplicateKeyError:
+            cart_item = await adb.Cart.find_one_and_update(query, update, upsert=True, return_document=ReturnDocument.AFTER)
+
+        if cart_item['quantity'] == quantity:
+            message = 'Product added to cart successfully'
+        else:
+            message = f'Product quantity updated in cart. New quantity: {cart_item["quantity"]}'
+
+        return JsonResponse({
+            'statusCode': 200,
+            'message': message,
+            'data': {
+                'cartItemId': str(cart_item['_id']),
+                'fkUserId': str(fk_user_id),
+                'fkProductId': str(fk_product_id),
+                'productName': product['name'],
+                'unitPrice': product['price'],
+                'quantity': cart_item['quantity'],
+                'totalPrice': cart_item['totalPrice']
+            }
+        })
+    except Exception:
+        print(format_exc())
+        return JsonResponse({'statusCode': 500, 'message': 'Internal server error'})
+
+
+@csrf_exempt
+@require_POST
+@async_jwt_required
+async def remove_from_cart(req):
+    """
+    Async ProductRemoveFromCart
+    POST /api/async/product/cart/remove
+    Payload: { "cartItemId": string }
+    """
+    try:
+        data = loads(req.body)
+        if 'cartItemId' not in data or not data['cartItemId']:
+            return JsonResponse({'statusCode': 400, 'message': 'Cart Item required'})
+
+        result = await get_async_db().Cart.update_one(
+            {'_id': ObjectId(data['cartItemId']), 'fkUserId': request_user_id(req)},
+            {'$set': {'activeFlag': False, 'isInactive': True, 'updatedOn': datetime.now()}}
+        )
+        if not result.matched_count:
+            return JsonResponse({'statusCode': 404, 'message': 'Cart item not found'})
+        if result.modified_count > 0:
+            return JsonResponse({
+                'statusCode': 200,
+                'message': 'Product removed from cart successfully',
+                'data': {'cartItemId': data['cartItemId']}
+            })
+        return JsonResponse({'statusCode': 400, 'message': 'Failed to remove product from cart'})
+    except Exception:
+        print(format_exc())
+        return JsonResponse({'statusCode': 500, 'message': 'Internal server error'})
+
+
+@csrf_exempt
+@require_POST
+@async_jwt_required
+async def cart_details(req):
+    """
+    Async GetUserCartDetails
+    POST /api/async/product/cart/details
+    Payload: { "fkUserId": string }
+    """
+    try:
+        data = loads(req.body)
+        fk_user_id = request_user_id(req, data.get('fkUserId'))
+        if fk_user_id is None:
+            return JsonResponse({'statusCode': 403, 'message': 'Not allowed for this user'})
+
+        cart_items = await get_async_db().Cart.find({
+            'fkUserId': fk_user_id,
+            'activeFlag': True,
+            'isInactive': False
+        }).to_list(None)
+        # Priced like checkout, from the current catalog
+        line_items, _ = price_cart_items(cart_items, await get_products([item['fkProductId'] for item in cart_items]))
+        current = {line['fkProductId']: line for line in line_items}
+        for item in cart_items:
+            line = current.get(item['fkProductId'])
+            if line:
+                item['unitPrice'] = line['unitPrice']
+                item['totalPrice'] = line['totalPrice']
+            item['available'] = line is not None
+            item['_id'] = str(item['_id'])
+            item['fkUserId'] = str(item['fkUserId'])
+            item['fkProductId'] = str(item['fkProductId'])
+            if 'createdOn' in item:
+                item['createdOn'] = item['createdOn'].isoformat() if hasattr(item['createdOn'], 'isoformat') else str(item['createdOn'])
+        return JsonResponse({
+            'statusCode': 200,
+            'message': 'Cart items retrieved successfully',
+            'data': cart_items,
+            'count': len(cart_items),
+            'totals': order_totals(sum(line['totalPrice'] for line in line_items))
+        })
+    except Exception:
+        print(format_exc())
+        return JsonResponse({'statusCode': 500, 'message': 'Internal server error'})
+
+
+@csrf_exempt
+@require_POST
+@async_jwt_required
+async def create_order(req):
+    """
+    Async CreateOrder
+    POST /api/async/order/create
+    Payload: { "fkUserId": string, "products": [{"fkProductId": string, "quantity": int}] }
+    """
+    try:
+        data = loads(req.body)
+        fk_user_id = request_user_id(req, data.get('fkUserId'))
+        if fk_user_id is None:
+            return JsonResponse({'statusCode': 403, 'message': 'Not allowed for this user'})
+        if 'products' not in data or not isinstance(data['products'], list) or not data['products']:
+            return JsonResponse({'statusCode': 400, 'message': 'Products required'})
+
+        adb = get_async_db()
+        if not await get_active_user(adb, fk_user_id):
+            return JsonResponse({'statusCode': 400, 'message': 'bad request user data not found'})
+
+        requested_items = []
+        for item in data['products']:
+            if 'fkProductId' not in item or not item['fkProductId']:
+                return JsonResponse({'statusCode': 400, 'message': 'bad request product data not found'})
+            if 'quantity' not in item or not isinstance(item['quantity'], int) or item['quantity'] < 1:
+                return JsonResponse({'statusCode': 400, 'message': 'Quantity must be a positive integer'})
+            if not ObjectId.is_valid(item['fkProductId']):
+                return JsonResponse({'statusCode': 400, 'message': f'Invalid product data: {item["fkProductId"]}'})
+            requested_items.append((ObjectId(item['fkProductId']), item['quantity']))
+
+        products_by_id = await get_products(list({product_id for product_id, _ in requested_items}))
+        order_items = []
+        for fk_product_id, quantity in requested_items:
+            product = products_by_id.get(fk_product_id)
+            if not product:
+                return JsonResponse({'statusCode': 400, 'message': 'bad request product data not found'})
+            order_items.append({
+                'fkProductId': fk_product_id,
+                'productName': product['name'],
+                'quantity': quantity,
+                'unitPrice': product['price'],
+                'totalPrice': product['price'] * quantity
+            })
+
+        # The order number allocator is synchronous, it only reaches the
+        # database when its reserved block is used up
+        order = await sync_to_async(build_order, thread_sensitive=False)(fk_user_id, order_items)
+        for attempt in range(ORDER_NUMBER_RETRIES):
+            try:
+                result = await adb.Orders.insert_one(order)
+                break
+            except DuplicateKeyError:
+                if attempt == ORDER_NUMBER_RETRIES - 1:
+                    raise
+                order.pop('_id', None)
+                order['orderNumber'] = await sync_to_async(next_order_number, thread_sensitive=False)()
+
+        publish_order_event('order.created', order)
+        return JsonResponse({
+            'statusCode': 200,
+            'message': 'Order created successfully',
+            'data': order_created_data(str(result.inserted_id), order)
+        })
+    except Exception:
+        print(format_exc())
+        return JsonResponse({'statusCode': 500, 'message': 'Internal server error'})
+
+
+@csrf_exempt
+@require_POST
+@async_jwt_required
+async def order_details(req):
+    """
+    Async GetSpecificOrderUser
+    POST /api/async/order/details
+    Payload: { "_id": string }
+    """
+    try:
+        data = loads(req.body)
+        if '_id' not in data or not data['_id']:
+            return JsonResponse({'statusCode': 400, 'message': 'bad request! product order not found'})
+
+        adb = get_async_read_db()
+        order_query = {'_id': ObjectId(data['_id']), 'activeFlag': True, 'isInactive': False}
+        if not is_admin(req.userLoginObj):
+            order_query['fkUserId'] = request_user_id(req)
+        order = await adb.Orders.find_one(order_query)
+        if not order:
+            # An order placed moments ago may not have replicated yet
+            order = await get_async_db().Orders.find_one(order_query)
+        if not order:
+            return JsonResponse({'statusCode': 404, 'message': 'Order not found'})
+
+        order['_id'] = str(order['_id'])
+        serialize_status(order)
+        if order.get('fkUserId'):
+            user_doc = await adb.clnUsers.find_one({'_id': order['fkUserId']}, projection={'name': 1})
+            if user_doc and 'name' in user_doc:
+                order['customerName'] = user_doc['name']
+        order['fkUserId'] = str(order['fkUserId']) if 'fkUserId' in order else None
+        if 'createdOn' in order:
+            try:
+                order['createdOn'] = order['createdOn'].isoformat()
+            except Exception:
+                order['createdOn'] = str(order['createdOn'])
+        for it in order.get('items', []):
+            if 'fkProductId' in it:
+                it['fkProductId'] = str(it['fkProductId'])
+
+        return JsonResponse({'statusCode': 200, 'message': 'Order retrieved successfully', 'data': order})
+    except Exception:
+        print(format_exc())
+        return JsonResponse({'statusCode': 500, 'message': 'Internal server error'})
+
+
+async def _event_stream(subscription, order_id=None):
+    heartbeat = getattr(settings, 'ORDER_EVENTS_HEARTBEAT', 15)
+    try:
+        # Reconnect delay for EventSource, in milliseconds
+        yield 'retry: 3000\n\n'
+        while True:
+            try:
+                event = await asyncio.wait_for(subscription.get(), heartbeat)
+            except asyncio.TimeoutError:
+                # Comment line, keeps proxies from closing an idle stream
+                yield ': keep-alive\n\n'
+                continue
+            if event is None:
+                return
+            if order_id is None or event.order_id == order_id:
+                yield event.frame
+    finally:
+        order_broker.unsubscribe(subscription)
+
+
+@csrf_exempt
+@require_POST
+@async_jwt_required
+async def order_events_token(req):
+    """
+    Stream token for order/events
+    POST /api/async/order/events/token
+    EventSource cannot send headers and would put the login token in the
+    URL (and so in access logs), so it opens the stream with this token
+    instead: it only works on order/events and expires after
+    ORDER_EVENTS_TOKEN_SECONDS. Fetch a new one before reconnecting.
+    """
+    return JsonResponse({
+        'statusCode': 200,
+        'message': 'Stream token issued',
+        'data': {
+            'token': generate_stream_token(req.userLoginObj['_id']),
+            'expiresIn': getattr(settings, 'ORDER_EVENTS_TOKEN_SECONDS', 60)
+        }
+    })
+
+
+@require_GET
+async def order_events(req):
+    """
+    Order changes pushed as server-sent events, instead of polling
+    order/details or order/search
+    GET /api/async/order/events?token=<stream token>&orderId=<id>
+    The token query parameter only takes a token from order/events/token,
+    an Authorization header takes the login token. Admins receive every
+    order, customers only their own, orderId narrows it to one order.
+    Events are order.created and order.status, each with data
+    {type, orderId, orderNumber, fkUserId, status, version, totalPrice,
+    createdOn}. A stream that falls behind is closed and the client
+    should reload after reconnecting. Needs the ASGI entry point.
+    """
+    auth_header = req.headers.get('Authorization', '')
+    if auth_header.startswith('Bearer '):
+        user, message = await authenticate(auth_header.split(' ')[1])
+    else:
+        user, message = await authenticate(req.GET.get('token'), verify=verify_stream_token)
+    if not user:
+        return JsonResponse({'statusCode': 401, 'message': message}, status=401)
+
+    order_id = req.GET.get('orderId') or None
+    if order_id is not None and not ObjectId.is_valid(order_id):
+        return JsonResponse({'statusCode': 400, 'message': 'Invalid order ID format'}, status=400)
+
+    channels = [ALL_ORDERS] if is_admin(user) else [user_channel(user['_id'])]
+    subscription = order_broker.subscribe(channels)
+    response = StreamingHttpResponse(_event_stream(subscription, order_id), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Stops nginx from buffering the stream
+    response['X-Accel-Buffering'] = 'no'
+    return response
@@ -12,6 +12,7 @@ from rest_framework.response import Response
 import json
 from functools import reduce
 import operator
+from math import ceil
 from zerasBurgerBackend.mongoConnection import db
 from CustomerApp.utils import (
     validate_email, 
@@ -19,8 +20,13 @@ from CustomerApp.utils import (
     validate_name,
     hash_password,
     generate_jwt_token,
-    verify_password
+    verify_password,
+    password_needs_rehash,
+    rehash_password_in_background,
+    PasswordHasherBusy
 )
+from CustomerApp.search import normalize_name
+from CustomerApp.ratelimit import login_limiter, client_ip
 dbconn = db
 
 
@@ -99,6 +105,7 @@ class RegisterUser(APIView):
             # Create user document
             doc = {
                 'name': formatted_name,
+                'nameLower': normalize_name(formatted_name),
                 'email': email.lower(),
                 'password': hashed_password,
                 'role': role,
@@ -131,6 +138,11 @@ class RegisterUser(APIView):
                 }
             })
             
+        except PasswordHasherBusy:
+            return JsonResponse({
+                'statusCode': 503,
+                'message': 'Server is busy, please try again shortly'
+            })
         except Exception:
             error = format_exc()
             return JsonResponse({
@@ -179,10 +191,19 @@ class LoginUser(APIView):
                     'message': email_message
                 })
             
+            # Throttle by email and client IP before any DB or bcrypt work
+            allowed, retry_after = login_limiter.check(email.lower(), client_ip(req))
+            if not allowed:
+                return JsonResponse({
+                    'statusCode': 429,
+                    'message': f'Too many login attempts, try again in {ceil(retry_after)} seconds'
+                })
+            
             # Find user by email
             user = dbconn.clnUsers.find_one({'email': email.lower()})
             
             if not user:
+                login_limiter.record_failure(email.lower())
                 return JsonResponse({
                     'statusCode': 401,
                     'message': 'Invalid email or password'
@@ -197,11 +218,18 @@ class LoginUser(APIView):
             
             # Verify password
             if not verify_password(password, user['password']):
+                login_limiter.record_failure(email.lower())
                 return JsonResponse({
                     'statusCode': 401,
                     'message': 'Invalid email or password'
                 })
             
+            login_limiter.record_success(email.lower())
+            
+            # Upgrade hashes made with a different bcrypt cost
+            if password_needs_rehash(user['password']):
+                rehash_password_in_background(user['_id'], password)
+            
             # Generate JWT token
             token = generate_jwt_token(user['_id'], user['email'], user['role'])
             
@@ -223,6 +251,11 @@ class LoginUser(APIView):
                 }
             })
             
+        except PasswordHasherBusy:
+            return JsonResponse({
+                'statusCode': 503,
+                'message': 'Server is busy, please try again shortly'
+            })
         except Exception:
             error = format_exc()
             return JsonResponse({
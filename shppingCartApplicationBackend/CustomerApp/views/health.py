@@ -0,0 +1,63 @@
+import os
+from django.http import JsonResponse
+from django.conf import settings
+from traceback import format_exc
+from rest_framework.views import APIView
+from zerasBurgerBackend.mongoConnection import pool_stats
+from CustomerApp.ratelimit import login_limiter
+
+
+class MongoPoolStats(APIView):
+    """
+    Connection pool counters of the worker that serves the request
+    GET /api/health/mongo-pool
+    Only enabled with MONGO_POOL_STATS. Each gunicorn worker has its own
+    pool, the pid in the response tells them apart.
+    """
+
+    def get(self, req):
+        if not getattr(settings, 'MONGO_POOL_STATS', False):
+            return JsonResponse({
+                'statusCode': 404,
+                'message': 'Not found'
+            }, status=404)
+        try:
+            return JsonResponse({
+                'statusCode': 200,
+                'message': 'Pool stats retrieved successfully',
+                'data': pool_stats()
+            })
+        except Exception:
+            print(format_exc())
+            return JsonResponse({
+                'statusCode': 500,
+                'message': 'Internal server error'
+            })
+
+
+class LoginLimiterStats(APIView):
+    """
+    Allowed, rejected and failed login counters of the worker that serves
+    the request
+    GET /api/health/login-limiter
+    Only enabled with LOGIN_RATE_LIMIT_STATS. Counters are per process.
+    """
+
+    def get(self, req):
+        if not getattr(settings, 'LOGIN_RATE_LIMIT_STATS', False):
+            return JsonResponse({
+                'statusCode': 404,
+                'message': 'Not found'
+            }, status=404)
+        try:
+            return JsonResponse({
+                'statusCode': 200,
+                'message': 'Login limiter stats retrieved successfully',
+                'data': dict(login_limiter.metrics(), pid=os.getpid())
+            })
+        except Exception:
+            print(format_exc())
+            return JsonResponse({
+                'statusCode': 500,
+                'message': 'Internal server error'
+            })
@@ -0,0 +1,136 @@
+import os
+import re
+import mimetypes
+from django.conf import settings
+from django.http import FileResponse, HttpResponse, Http404
+from django.utils.http import http_date, parse_etags, parse_http_date_safe
+from django.views.decorators.http import require_safe
+from CustomerApp.storage import IMMUTABLE_CACHE_CONTROL, valid_key
+
+# images/<aa>/<sha256>.<ext> written by the content addressed image store
+HASHED_NAME_REGEX = re.compile(r'^images/[0-9a-f]{2}/([0-9a-f]{64})\.\w+$')
+RANGE_REGEX = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+class _FileRange:
+    """Read only window of an open file, streamed by FileResponse"""
+
+    def __init__(self, file, start, length):
+        self.file = file
+        self.remaining = length
+        file.seek(start)
+
+    def read(self, size=-1):
+        if self.remaining <= 0:
+            return b''
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def close(self):
+        self.file.close()
+
+
+def _byte_range(header, size):
+    """
+    (start, end) inclusive for a single "bytes=" range, None to send the
+    whole file, or False when the range cannot be satisfied
+    """
+    match = RANGE_REGEX.match(header.strip())
+    if not match or match.group(1) == match.group(2) == '':
+        return None
+    first, last = match.groups()
+    if first == '':
+        # Suffix range: the last N bytes
+        length = int(last)
+        if length == 0:
+            return False
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        return False
+    return start, end
+
+
+@require_safe
+def serve_media(req, path):
+    """
+    Uploaded media under MEDIA_ROOT
+    GET/HEAD /media/<path>
+
+    Content addressed images (images/<aa>/<sha256>.<ext>) never change, so
+    they are sent with an immutable Cache-Control; anything else is
+    cacheable for MEDIA_CACHE_MAX_AGE seconds and revalidated with its
+    ETag or Last-Modified. Whole files go out through FileResponse, which
+    the WSGI server's file_wrapper turns into sendfile(). Single byte
+    ranges are answered with 206.
+
+    With MEDIA_ACCEL_REDIRECT_PREFIX set, the response only carries an
+    X-Accel-Redirect header and nginx sends the file itself (including
+    ranges), e.g.
+        location /protected-media/ { internal; alias /srv/app/media/; }
+    """
+    if not valid_key(path):
+        raise Http404('Media not found')
+    full_path = os.path.join(settings.MEDIA_ROOT, *path.split('/'))
+    try:
+        stat = os.stat(full_path)
+    except OSError:
+        raise Http404('Media not found')
+    if not os.path.isfile(full_path):
+        raise Http404('Media not found')
+
+    hashed = HASHED_NAME_REGEX.match(path)
+    etag = f'"{hashed.group(1)}"' if hashed else f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+    headers = {
+        'ETag': etag,
+        'Last-Modified': http_date(stat.st_mtime),
+        'Cache-Control': IMMUTABLE_CACHE_CONTROL if hashed else f'public, max-age={getattr(settings, "MEDIA_CACHE_MAX_AGE", 86400)}',
+        'Accept-Ranges': 'bytes',
+    }
+    content_type = mimetypes.guess_type(full_path)[0] or 'application/octet-stream'
+
+    if_none_match = req.headers.get('If-None-Match')
+    if if_none_match is not None:
+        not_modified = etag in parse_etags(if_none_match) or if_none_match.strip() == '*'
+    else:
+        since = parse_http_date_safe(req.headers.get('If-Modified-Since', ''))
+        not_modified = since is not None and int(stat.st_mtime) <= since
+    if not_modified:
+        response = HttpResponse(status=304)
+        for name, value in headers.items():
+            response[name] = value
+        return response
+
+    accel_prefix = getattr(settings, 'MEDIA_ACCEL_REDIRECT_PREFIX', '')
+    if accel_prefix:
+        response = HttpResponse(content_type=content_type)
+        response['X-Accel-Redirect'] = accel_prefix.rstrip('/') + '/' + path
+        for name, value in headers.items():
+            response[name] = value
+        return response
+
+    byte_range = None
+    range_header = req.headers.get('Range')
+    if_range = req.headers.get('If-Range')
+    if range_header and (if_range is None or if_range.strip() == etag):
+        byte_range = _byte_range(range_header, stat.st_size)
+    if byte_range is False:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{stat.st_size}'
+        response['Accept-Ranges'] = 'bytes'
+        return response
+
+    if byte_range:
+        start, end = byte_range
+        response = FileResponse(_FileRange(open(full_path, 'rb'), start, end - start + 1), content_type=content_type, status=206)
+        response['Content-Length'] = end - start + 1
+        response['Content-Range'] = f'bytes {start}-{end}/{stat.st_size}'
+    else:
+        response = FileResponse(open(full_path, 'rb'), content_type=content_type)
+    for name, value in headers.items():
+        response[name] = value
+    return response
@@ -10,12 +10,96 @@ import base64
 import os
 from bson.objectid import ObjectId
 from django.conf import settings
-from zerasBurgerBackend.mongoConnection import db
+from pymongo import UpdateOne, UpdateMany
+from pymongo.errors import BulkWriteError, DuplicateKeyError, OperationFailure
+from zerasBurgerBackend.mongoConnection import db, client, read_db
+from CustomerApp.sequences import next_order_number
+from CustomerApp.order_states import (OrderTransitionError, explain_failure, normalize_status, serialize_status,
+    stored_statuses, transition_order, transition_query, transition_update)
+from CustomerApp.search import plan_order_search
+from CustomerApp.events import publish_order_event
+from CustomerApp.catalog import catalog_cache
+from CustomerApp.pricing import order_totals, price_cart_items
+from CustomerApp.users import get_active_user
+from CustomerApp.utils import admin_required, is_admin, jwt_required, request_user_id
 from django.views.decorators.csrf import csrf_exempt
 from django.utils.decorators import method_decorator
 
 dbconn = db
+# Order history reads that tolerate replication lag
+readconn = read_db
 
+ORDER_NUMBER_RETRIES = 3
+ORDER_BATCH_MAX_ORDERS = 100
+ORDER_SEARCH_DEFAULT_LIMIT = 50
+ORDER_SEARCH_MAX_LIMIT = 200
+
+# Flipped off the first time the server rejects a transaction (standalone mongod)
+_transactions_supported = True
+
+class CartChanged(Exception):
+    """The cart was modified by another request while checking out"""
+
+
+def build_order(fk_user_id, order_items):
+    """New pending order document for the given line items"""
+    order = {
+        'fkUserId': fk_user_id,
+        'items': order_items,
+    }
+    order.update(order_totals(sum(item['totalPrice'] for item in order_items)))
+    order.update({
+        'orderNumber': next_order_number(),
+        'status': 'pending',
+        'version': 0,
+        'createdOn': datetime.now(),
+        'activeFlag': True,
+        'isInactive': False
+    })
+    return order
+
+
+def insert_order(order, session=None):
+    """
+    Insert an order and return its _id. The unique orderNumber index guards
+    against a number that was already taken outside the allocator.
+    """
+    for attempt in range(ORDER_NUMBER_RETRIES):
+        try:
+            return dbconn.Orders.insert_one(order, session=session).inserted_id
+        except DuplicateKeyError:
+            # Inside a transaction the error aborts it, let the caller retry
+            if attempt == ORDER_NUMBER_RETRIES - 1 or session is not None:
+                raise
+            order.pop('_id', None)
+            order['orderNumber'] = next_order_number()
+
+
+def order_created_data(order_id, order):
+    """Response data for a newly created order"""
+    return {
+        'orderId': order_id,
+        'orderNumber': order['orderNumber'],
+        'fkUserId': str(order['fkUserId']),
+        'items': [
+            {
+                'fkProductId': str(item['fkProductId']),
+                'productName': item['productName'],
+                'quantity': item['quantity'],
+                'unitPrice': item['unitPrice'],
+                'totalPrice': item['totalPrice']
+            } for item in order['items']
+        ],
+        'subtotal': order['subtotal'],
+        'deliveryCharge': order['deliveryCharge'],
+        'taxPercentage': order['taxPercentage'],
+        'taxAmount': order['taxAmount'],
+        'totalPrice': order['totalPrice'],
+        'status': order['status']
+    }
+
+
+@method_decorator(jwt_required, name='post')
 class CreateOrder(APIView):
     """
     API endpoint to create a new order
@@ -33,17 +117,19 @@ class CreateOrder(APIView):
             }
         ]
     }
+    fkUserId is optional, it must be the logged in user's
     """
     
     def post(self, req):
         try:
             data = loads(req.body)
             
-            # Validate required fields
-            if 'fkUserId' not in data or not data['fkUserId']:
+            # Orders are placed for the logged in user only
+            fk_user_id = request_user_id(req, data.get('fkUserId'))
+            if fk_user_id is None:
                 return JsonResponse({
-                    'statusCode': 400,
-                    'message': 'bad request user data not found'
+                    'statusCode': 403,
+                    'message': 'Not allowed for this user'
                 })
             
             if 'products' not in data or not isinstance(data['products'], list) or not data['products']:
@@ -53,7 +139,6 @@ class CreateOrder(APIView):
                 })
             
             try:
-                fk_user_id = ObjectId(data['fkUserId'])
                 user = dbconn.clnUsers.find_one({'_id': fk_user_id, 'activeFlag': True})
                 if not user:
                     return JsonResponse({
@@ -66,9 +151,9 @@ class CreateOrder(APIView):
                     'message': 'Invalid user data'
                 })
             
-            order_items = []
-            calculated_total = 0
-            
+            # Validate every line item up front so that all products can be
+            # resolved from the catalog cache (one $in query for any misses)
+            requested_items = []
             for item in data['products']:
                 if 'fkProductId' not in item or not item['fkProductId']:
                     return JsonResponse({
@@ -84,94 +169,44 @@ class CreateOrder(APIView):
                 
                 try:
                     fk_product_id = ObjectId(item['fkProductId'])
-                    product = dbconn.Products.find_one({'_id': fk_product_id, 'activeFlag': True})
-                    if not product:
-                        return JsonResponse({
-                            'statusCode': 400,
-                            'message': 'bad request product data not found'
-                        })
-                    
-                    # Calculate item total
-                    item_total = product['price'] * item['quantity']
-                    calculated_total += item_total
-                    
-                    order_items.append({
-                        'fkProductId': fk_product_id,
-                        'productName': product['name'],
-                        'quantity': item['quantity'],
-                        'unitPrice': product['price'],
-                        'totalPrice': item_total
-                    })
-                    
                 except:
                     return JsonResponse({
                         'statusCode': 400,
                         'message': f'Invalid product data: {item["fkProductId"]}'
                     })
+                requested_items.append((fk_product_id, item['quantity']))
 
-            delivery_charge = 50.00 
-            subtotal = calculated_total
-            tax_percentage = 0.05
-            tax_amount = round(subtotal * tax_percentage, 2)
-            final_total = subtotal + delivery_charge + tax_amount
-            last_order = dbconn.Orders.find_one(
-                {}, sort=[("createdOn", -1)], projection={"orderNumber": 1}
-            )
-            if last_order and "orderNumber" in last_order and str(last_order["orderNumber"]).startswith("ON"):
-                try:
-                    last_num = int(str(last_order["orderNumber"])[2:])
-                except Exception:
-                    last_num = 0
-                next_num = last_num + 1
-            else:
-                next_num = 1
-            while True:
-                orderNumber = f"ON{next_num:05d}"
-                duplicate = dbconn.Orders.find_one({"orderNumber": orderNumber})
-                if not duplicate:
-                    break
-                next_num += 1
-
-            order = {
-                'fkUserId': fk_user_id,
-                'items': order_items,
-                'subtotal': subtotal,
-                'deliveryCharge': delivery_charge,
-                'taxPercentage': tax_percentage * 100,
-                'taxAmount': tax_amount,
-                'totalPrice': final_total,
-                'orderNumber': orderNumber,
-                'status': 'pending',
-                'createdOn': datetime.now(),
-                'activeFlag': True,
-                'isInactive': False
-            }
+            product_ids = list({fk_product_id for fk_product_id, _ in requested_items})
+            products_by_id = catalog_cache.get_products(product_ids)
+
+            order_items = []
             
-            # Insert order
-            result = dbconn.Orders.insert_one(order)
-            order_id = str(result.inserted_id)
+            for fk_product_id, quantity in requested_items:
+                product = products_by_id.get(fk_product_id)
+                if not product:
+                    return JsonResponse({
+                        'statusCode': 400,
+                        'message': 'bad request product data not found'
+                    })
+                
+                # Calculate item total
+                item_total = product['price'] * quantity
+                
+                order_items.append({
+                    'fkProductId': fk_product_id,
+                    'productName': product['name'],
+                    'quantity': quantity,
+                    'unitPrice': product['price'],
+                    'totalPrice': item_total
+                })
+
+            order = build_order(fk_user_id, order_items)
+            order_id = str(insert_order(order))
+            publish_order_event('order.created', order)
             return JsonResponse({
                 'statusCode': 200,
                 'message': 'Order created successfully',
-                'data': {
-                    'orderId': order_id,
-                    'fkUserId': str(fk_user_id),
-                    'items': [
-                        {
-                            'fkProductId': str(item['fkProductId']),
-                            'productName': item['productName'],
-                            'quantity': item['quantity'],
-                            'unitPrice': item['unitPrice'],
-                            'totalPrice': item['totalPrice']
-                        } for item in order_items
-                    ],
-                    'subtotal': subtotal,
-                    'deliveryCharge': delivery_charge,
-                    'taxPercentage': tax_percentage * 100,
-                    'taxAmount': tax_amount,
-                    'totalPrice': final_total,
-                    'status': 'pending'
-                }
+                'data': order_created_data(order_id, order)
             })
             
         except Exception as e:
@@ -182,46 +217,224 @@ class CreateOrder(APIView):
             })
 
 
+def _checkout_with_transaction(cart_ids, order):
+    """Deactivate the cart rows and insert the order atomically"""
+    def apply(session):
+        result = dbconn.Cart.update_many(
+            {'_id': {'$in': cart_ids}, 'activeFlag': True},
+            {'$set': {'activeFlag': False, 'isInactive': True, 'updatedOn': datetime.now()}},
+            session=session
+        )
+        if result.modified_count != len(cart_ids):
+            raise CartChanged()
+        return insert_order(order, session=session)
+
+    for attempt in range(ORDER_NUMBER_RETRIES):
+        with client.start_session() as session:
+            try:
+                return session.with_transaction(apply)
+            except DuplicateKeyError:
+                if attempt == ORDER_NUMBER_RETRIES - 1:
+                    raise
+                order.pop('_id', None)
+                order['orderNumber'] = next_order_number()
+
+
+def _checkout_without_transaction(cart_ids, order):
+    """
+    Fallback for servers without transactions: claim the cart rows with a
+    checkout token first, then insert the order, and give the rows back if
+    either step fails.
+    """
+    token = ObjectId()
+    claim = dbconn.Cart.update_many(
+        {'_id': {'$in': cart_ids}, 'activeFlag': True},
+        {'$set': {'activeFlag': False, 'isInactive': True, 'checkoutId': token, 'updatedOn': datetime.now()}}
+    )
+    try:
+        if claim.modified_count != len(cart_ids):
+            raise CartChanged()
+        return insert_order(order)
+    except Exception:
+        dbconn.Cart.update_many(
+            {'checkoutId': token},
+            {'$set': {'activeFlag': True, 'isInactive': False}, '$unset': {'checkoutId': ''}}
+        )
+        raise
+
+
+def checkout_cart(cart_ids, order):
+    """Turn the cart rows into the order, returns the new order _id"""
+    global _transactions_supported
+    if _transactions_supported:
+        try:
+            return _checkout_with_transaction(cart_ids, order)
+        except OperationFailure as e:
+            # IllegalOperation: transactions need a replica set or mongos
+            if e.code != 20:
+                raise
+            _transactions_supported = False
+    return _checkout_without_transaction(cart_ids, order)
+
+
 @method_decorator(csrf_exempt, name='dispatch')
+@method_decorator(jwt_required, name='post')
+class CheckoutCart(APIView):
+    """
+    API endpoint to place an order for everything in the user's cart
+    POST /api/product/cart/checkout
+    Payload: {
+        "fkUserId": string (optional, must be the logged in user's)
+    }
+    The cart is read once and repriced against the catalog cache; the order
+    insert and the cart deactivation happen in one transaction (or a claim
+    and compensate sequence on a standalone server).
+    """
+
+    def post(self, req):
+        try:
+            data = loads(req.body)
+            fk_user_id = request_user_id(req, data.get('fkUserId'))
+            if fk_user_id is None:
+                return JsonResponse({
+                    'statusCode': 403,
+                    'message': 'Not allowed for this user'
+                })
+            if not get_active_user(fk_user_id):
+                return JsonResponse({
+                    'statusCode': 400,
+                    'message': 'bad request user data not found'
+                })
+
+            cart_items = list(dbconn.Cart.find(
+                {'fkUserId': fk_user_id, 'activeFlag': True, 'isInactive': False},
+                projection={'fkProductId': 1, 'quantity': 1}
+            ))
+            if not cart_items:
+                return JsonResponse({
+                    'statusCode': 400,
+                    'message': 'Cart is empty'
+                })
+
+            products_by_id = catalog_cache.get_products([item['fkProductId'] for item in cart_items])
+            order_items, unavailable = price_cart_items(cart_items, products_by_id)
+            if unavailable:
+                return JsonResponse({
+                    'statusCode': 400,
+                    'message': 'bad request product data not found'
+                })
+
+            order = build_order(fk_user_id, order_items)
+            try:
+                order_id = str(checkout_cart([item['_id'] for item in cart_items], order))
+            except CartChanged:
+                return JsonResponse({
+                    'statusCode': 409,
+                    'message': 'Cart was changed during checkout, please try again'
+                })
+
+            publish_order_event('order.created', order)
+            return JsonResponse({
+                'statusCode': 200,
+                'message': 'Order created successfully',
+                'data': order_created_data(order_id, order)
+            })
+
+        except Exception as e:
+            print(format_exc())
+            return JsonResponse({
+                'statusCode': 500,
+                'message': 'Internal server error'
+            })
+
+
+def _encode_order_cursor(order):
+    """Opaque pagination cursor for the (createdOn, _id) of an order"""
+    raw = f"{order['createdOn'].isoformat()}|{order['_id']}"
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii')
+
+
+def _decode_order_cursor(cursor):
+    """Inverse of _encode_order_cursor, raises on malformed input"""
+    raw = base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8')
+    created_on, order_id = raw.rsplit('|', 1)
+    return datetime.fromisoformat(created_on), ObjectId(order_id)
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+@method_decorator(jwt_required, name='post')
+@method_decorator(admin_required, name='post')
 class SearchUserOrder(APIView):
     """
-    Search orders by orderNumber or customer name and optional status filter
+    Search orders by orderNumber or customer name and optional status filter (admin only)
     POST /api/product/order/search
     Payload: {
-        status
+        query, status,
+        limit: int (optional, page size, default ORDER_SEARCH_DEFAULT_LIMIT),
+        after: string (optional, nextCursor of the previous page),
+        summary: bool (optional, leave out line items)
     }
+    Results are always paged, nextCursor is null on the last page.
     """
     def post(self, req):
         try:
             data = loads(req.body)
             query_str = data.get('query', '')
             status = data.get('status')
+            limit = data.get('limit', ORDER_SEARCH_DEFAULT_LIMIT)
+            after = data.get('after')
+
+            if not isinstance(limit, int) or isinstance(limit, bool) or limit < 1:
+                return JsonResponse({'statusCode': 400, 'message': 'limit must be a positive integer'})
+            limit = min(limit, ORDER_SEARCH_MAX_LIMIT)
 
             base_query = {'activeFlag': True, 'isInactive': False}
             if status:
-                base_query['status'] = status
+                # Old orders may carry a legacy spelling of the status
+                canonical = normalize_status(status)
+                base_query['status'] = {'$in': stored_statuses(canonical)} if canonical else status
+
+            # If query provided, search orderNumber or customer name
+            if query_str and query_str.strip():
+                base_query.update(plan_order_search(query_str))
 
-            # If query provided, search orderNumber and user name
-            if query_str:
-                user_ids = []
+            # Keyset pagination: continue strictly after the last (createdOn, _id) seen
+            if after:
                 try:
-                    users = list(dbconn.clnUsers.find({'name': {'$regex': query_str, '$options': 'i'}, 'activeFlag': True}))
-                    user_ids = [u['_id'] for u in users]
+                    after_created_on, after_id = _decode_order_cursor(after)
                 except Exception:
-                    user_ids = []
+                    return JsonResponse({'statusCode': 400, 'message': 'Invalid cursor'})
+                base_query['$and'] = [{'$or': [
+                    {'createdOn': {'$lt': after_created_on}},
+                    {'createdOn': after_created_on, '_id': {'$lt': after_id}}
+                ]}]
 
-                or_clauses = [{'orderNumber': {'$regex': query_str, '$options': 'i'}}]
-                if user_ids:
-                    or_clauses.append({'fkUserId': {'$in': user_ids}})
+            projection = {'items': 0} if data.get('summary') else None
+            cursor = readconn.Orders.find(base_query, projection=projection).sort([('createdOn', -1), ('_id', -1)])
+            next_cursor = None
+            # One extra document tells whether another page exists
+            orders = list(cursor.limit(limit + 1))
+            if len(orders) > limit:
+                orders = orders[:limit]
+                next_cursor = _encode_order_cursor(orders[-1])
 
-                base_query['$or'] = or_clauses
-
-            orders = list(dbconn.Orders.find(base_query).sort('createdOn', -1))
+            # Resolve every customer name with one batched lookup
+            customer_ids = list({o['fkUserId'] for o in orders if o.get('fkUserId')})
+            customer_names = {}
+            if customer_ids:
+                customer_names = {
+                    u['_id']: u['name']
+                    for u in readconn.clnUsers.find({'_id': {'$in': customer_ids}}, projection={'name': 1})
+                    if 'name' in u
+                }
 
             result = []
             for o in orders:
                 item = o.copy()
                 item['_id'] = str(item['_id'])
+                serialize_status(item)
+                if item.get('fkUserId') in customer_names:
+                    item['customerName'] = customer_names[item['fkUserId']]
                 item['fkUserId'] = str(item['fkUserId']) if 'fkUserId' in item else None
                 if 'createdOn' in item:
                     try:
@@ -232,20 +445,14 @@ class SearchUserOrder(APIView):
                     for it in item['items']:
                         if 'fkProductId' in it:
                             it['fkProductId'] = str(it['fkProductId'])
-                try:
-                    user = dbconn.clnUsers.find_one({'_id': ObjectId(item['fkUserId'])}) if item.get('fkUserId') else None
-                    if user and 'name' in user:
-                        item['customerName'] = user['name']
-                except Exception:
-                    pass
-
                 result.append(item)
 
             return JsonResponse({
                 'statusCode': 200,
                 'message': 'Cart items retrieved successfully',
                 'data': result,
-                'count': len(result)
+                'count': len(result),
+                'nextCursor': next_cursor
             })
         except Exception as e:
             print(format_exc())
@@ -253,11 +460,13 @@ class SearchUserOrder(APIView):
 
 
 @method_decorator(csrf_exempt, name='dispatch')
+@method_decorator(jwt_required, name='post')
 class GetSpecificOrderUser(APIView):
     """
     Get a specific order by _id
     POST /api/product/order/details
     Payload: { "_id": string }
+    Customers only find their own orders, admins any order
     """
     def post(self, req):
         try:
@@ -265,14 +474,21 @@ class GetSpecificOrderUser(APIView):
             if '_id' not in data or not data['_id']:
                 return JsonResponse({'statusCode': 400, 'message': 'bad request! product order not found'})
             
-            order = dbconn.Orders.find_one({'_id': ObjectId(data['_id']), 'activeFlag': True, 'isInactive': False})
+            order_query = {'_id': ObjectId(data['_id']), 'activeFlag': True, 'isInactive': False}
+            if not is_admin(req.userLoginObj):
+                order_query['fkUserId'] = request_user_id(req)
+            order = readconn.Orders.find_one(order_query)
+            if not order:
+                # An order placed moments ago may not have replicated yet
+                order = dbconn.Orders.find_one(order_query)
             if not order:
                 return JsonResponse({'statusCode': 404, 'message': 'Order not found'})
 
             order['_id'] = str(order['_id'])
+            serialize_status(order)
             try:
                 if 'fkUserId' in order and order.get('fkUserId'):
-                    user_doc = dbconn.clnUsers.find_one({'_id': order['fkUserId']})
+                    user_doc = readconn.clnUsers.find_one({'_id': order['fkUserId']}, projection={'name': 1})
                     if user_doc and 'name' in user_doc:
                         order['customerName'] = user_doc['name']
             except Exception:
@@ -296,11 +512,16 @@ class GetSpecificOrderUser(APIView):
 
 
 @method_decorator(csrf_exempt, name='dispatch')
+@method_decorator(jwt_required, name='post')
+@method_decorator(admin_required, name='post')
 class UpdateUserOrder(APIView):
     """
-    Update order status
+    Update order status through the order state machine (admin only)
     POST /api/product/order/update
-    Payload: { "_id":string, "status": string }
+    Payload: { "_id": string, "status": string, "fromStatus": string (optional), "version": int (optional) }
+    pending -> preparing -> out-for-delivery -> delivered, or cancelled
+    before delivery. With fromStatus/version the update only applies if
+    the order is still in that state, otherwise 409 with the current one.
     """
     def post(self, req):
         try:
@@ -311,26 +532,174 @@ class UpdateUserOrder(APIView):
                 return JsonResponse({'statusCode': 400, 'message': 'Invalid order ID format'})
             if 'status' not in data or not data['status']:
                 return JsonResponse({'statusCode': 400, 'message': 'status not selected.'})
+            version = data.get('version')
+            if not _valid_version(version):
+                return JsonResponse({'statusCode': 400, 'message': 'version must be a non-negative integer'})
 
-            order_id = ObjectId(data['_id'])
-            existing = dbconn.Orders.find_one({'_id': order_id})
-            if not existing:
-                return JsonResponse({'statusCode': 400, 'message': 'bad request! Order not found'})
+            try:
+                order = transition_order(ObjectId(data['_id']), data['status'], data.get('fromStatus'), version)
+            except OrderTransitionError as e:
+                response = {'statusCode': e.status_code, 'message': e.message}
+                if e.order:
+                    response['data'] = e.order
+                return JsonResponse(response)
 
-            result = dbconn.Orders.update_one({'_id': order_id}, {'$set': {'status': data['status'], 'updatedOn': datetime.now()}})
-            if result.modified_count > 0:
-                return JsonResponse({'statusCode': 200, 'message': 'Order status updated successfully', 'data': {'orderId': data['_id'], 'status': data['status']}})
-            else:
-                return JsonResponse({'statusCode': 400, 'message': 'No changes made to the order'})
+            publish_order_event('order.status', order)
+            return JsonResponse({
+                'statusCode': 200,
+                'message': 'Order status updated successfully',
+                'data': {'orderId': data['_id'], 'status': order['status'], 'version': order['version']}
+            })
         except Exception:
             print(format_exc())
             return JsonResponse({'statusCode': 500, 'message': 'Internal server error'})
 
 
+def _valid_version(version):
+    """None (not checked) or a non-negative int"""
+    return version is None or (isinstance(version, int) and not isinstance(version, bool) and version >= 0)
+
+
 @method_decorator(csrf_exempt, name='dispatch')
+@method_decorator(jwt_required, name='post')
+@method_decorator(admin_required, name='post')
+class BatchUpdateUserOrders(APIView):
+    """
+    Update the status of several orders in one request (admin only)
+    POST /api/order/update/batch
+    Payload: {
+        "status": string (target of entries without their own),
+        "orders": [
+            string (order ID),
+            or {"_id": string, "status": string, "fromStatus": string, "version": int}
+        ]
+    }
+    "orderIds" is accepted in place of "orders". Every entry is checked
+    against the state machine first, then the valid ones go out in one
+    unordered bulk_write: entries that share a target and carry no
+    fromStatus/version become a single UpdateMany, the others a
+    conditional UpdateOne each. One read afterwards fills data.results
+    with, per entry, statusCode 200 and the new status/version, or the
+    400/404/409 that order/update would have answered.
+    """
+
+    def post(self, req):
+        try:
+            data = loads(req.body)
+            entries = data.get('orders', data.get('orderIds'))
+            if not isinstance(entries, list) or not entries:
+                return JsonResponse({'statusCode': 400, 'message': 'Orders required'})
+            if len(entries) > ORDER_BATCH_MAX_ORDERS:
+                return JsonResponse({
+                    'statusCode': 400,
+                    'message': f'At most {ORDER_BATCH_MAX_ORDERS} orders allowed per request'
+                })
+
+            results = []
+            changes = []
+            seen = set()
+            for index, entry in enumerate(entries):
+                result = {'index': index}
+                results.append(result)
+                raw_id = entry.get('_id') if isinstance(entry, dict) else entry
+                if isinstance(raw_id, str):
+                    result['orderId'] = raw_id
+                try:
+                    change = self.build_change(entry, data.get('status'))
+                    if change['_id'] in seen:
+                        raise OrderTransitionError('Order listed more than once', 400)
+                except OrderTransitionError as e:
+                    result.update({'statusCode': e.status_code, 'message': e.message})
+                    continue
+                seen.add(change['_id'])
+                changes.append((index, change))
+
+            applied = 0
+            if changes:
+                # Marks the orders this request changed, see transition_update
+                transition_id = ObjectId()
+                writes = []
+                shared = {}
+                for index, change in changes:
+                    if change['fromStatus'] is None and change['version'] is None:
+                        shared.setdefault(change['target'], []).append(change['_id'])
+                    else:
+                        writes.append(UpdateOne(change['query'], transition_update(change['target'], transition_id)))
+                for target, order_ids in shared.items():
+                    _, query = transition_query({'$in': order_ids}, target)
+                    writes.append(UpdateMany(query, transition_update(target, transition_id)))
+
+                try:
+                    dbconn.Orders.bulk_write(writes, ordered=False)
+                except BulkWriteError:
+                    # Unordered, so the other writes still ran; the read below tells which
+                    print(format_exc())
+
+                current = {
+                    order['_id']: order
+                    for order in dbconn.Orders.find(
+                        {'_id': {'$in': list(seen)}},
+                        projection={'status': 1, 'version': 1, 'transitionId': 1, 'activeFlag': 1, 'isInactive': 1,
+                                    'fkUserId': 1, 'orderNumber': 1, 'totalPrice': 1, 'createdOn': 1}
+                    )
+                }
+                for index, change in changes:
+                    order = current.get(change['_id'])
+                    if order is not None and order.get('transitionId') == transition_id:
+                        results[index].update({'statusCode': 200, 'status': change['target'], 'version': order['version']})
+                        applied += 1
+                        publish_order_event('order.status', order)
+                        continue
+                    error = explain_failure(order, change['_id'], change['target'], change['fromStatus'], change['version'])
+                    results[index].update({'statusCode': error.status_code, 'message': error.message})
+                    if error.order:
+                        results[index].update({'status': error.order['status'], 'version': error.order['version']})
+
+            return JsonResponse({
+                'statusCode': 200,
+                'message': f'{applied} of {len(entries)} orders updated',
+                'data': {
+                    'applied': applied,
+                    'results': results
+                }
+            })
+        except Exception:
+            print(format_exc())
+            return JsonResponse({'statusCode': 500, 'message': 'Internal server error'})
+
+    @staticmethod
+    def build_change(entry, default_status):
+        """Validated change for one entry, OrderTransitionError (400) when it is invalid"""
+        if isinstance(entry, str):
+            entry = {'_id': entry}
+        if not isinstance(entry, dict):
+            raise OrderTransitionError('Order must be an order ID or an object', 400)
+        if not isinstance(entry.get('_id'), str) or not ObjectId.is_valid(entry['_id']):
+            raise OrderTransitionError('Invalid order ID format', 400)
+        target = entry.get('status') or default_status
+        if not target:
+            raise OrderTransitionError('status not selected.', 400)
+        version = entry.get('version')
+        if not _valid_version(version):
+            raise OrderTransitionError('version must be a non-negative integer', 400)
+
+        order_id = ObjectId(entry['_id'])
+        target, query = transition_query(order_id, target, entry.get('fromStatus'), version)
+        return {
+            '_id': order_id,
+            'target': target,
+            'fromStatus': entry.get('fromStatus'),
+            'version': version,
+            'query': query
+        }
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+@method_decorator(jwt_required, name='post')
+@method_decorator(admin_required, name='post')
 class RemovedUserOrder(APIView):
     """
-    Soft-remove an order by user
+    Soft-remove an order (admin only)
     POST /api/order/remove
     Payload: {_id:string}
     """
@@ -340,20 +709,16 @@ class RemovedUserOrder(APIView):
             if '_id' not in data or not data['_id']:
                 return JsonResponse({'statusCode': 400, 'message': 'Order is required'})
 
-            order_id = ObjectId(data['_id'])
-            existing = dbconn.Orders.find_one({'_id': order_id, 'activeFlag': True, 'isInactive': False})
-            if not existing:
-                return JsonResponse({'statusCode': 400, 'message': 'bad request! Order not found'})
-
+            # One conditional update, a missing or already removed order matches nothing
             result = dbconn.Orders.update_one(
-                {'_id': order_id},
-                {'$set': {'activeFlag': False, 'isInactive': True, 'updatedOn': datetime.now()}}
+                {'_id': ObjectId(data['_id']), 'activeFlag': True, 'isInactive': False},
+                {'$set': {'activeFlag': False, 'isInactive': True, 'updatedOn': datetime.now()}, '$inc': {'version': 1}}
             )
 
             if result.modified_count > 0:
                 return JsonResponse({'statusCode': 200, 'message': 'Order removed successfully'})
             else:
-                return JsonResponse({'statusCode': 400, 'message': 'Failed to remove order'})
+                return JsonResponse({'statusCode': 400, 'message': 'bad request! Order not found'})
 
         except Exception:
             print(format_exc())
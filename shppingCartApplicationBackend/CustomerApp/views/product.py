@@ -1,16 +1,26 @@
 from json import loads
 import json
 from re import match as re_match
-from django.http import JsonResponse
+from django.http import JsonResponse, HttpResponse
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils.http import parse_etags
+from django.utils.decorators import method_decorator
 from datetime import datetime
 from traceback import format_exc
 from rest_framework.views import APIView
 from rest_framework.permissions import IsAuthenticated
 import base64
-import os
 from bson.objectid import ObjectId
-from django.conf import settings
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import DuplicateKeyError, BulkWriteError
 from zerasBurgerBackend.mongoConnection import db
+from CustomerApp.catalog import catalog_cache, serialize_product
+from CustomerApp.users import get_active_user
+from CustomerApp.utils import admin_required, jwt_required, request_user_id
+from CustomerApp.pricing import order_totals, price_cart_items
+from CustomerApp.images import (IMAGE_EXTENSIONS, ProductImageUploadHandler, max_image_bytes,
+    save_image_bytes, stored_image_exists)
+from CustomerApp.image_variants import schedule_product_image
 
 dbconn = db
 
@@ -78,29 +88,35 @@ class CreateProduct(APIView):
             
             if image_data.startswith('data:image'):
                 try:
-                    # Use regex to properly extract format and base64 data
                     # Expected format: data:image/jpeg;base64,/9j/4AAQ...
-                    pattern = r'data:image/(\w+);base64,(.+)'
-                    match = re_match(pattern, image_data)
+                    # Only the short header is matched, never the whole payload
+                    header, _, base64_data = image_data.partition(',')
+                    match = re_match(r'data:image/(\w+);base64$', header)
                     
-                    if not match:
+                    if not match or not base64_data:
                         return JsonResponse({
                             'statusCode': 400,
                             'message': 'Invalid base64 image format. Expected: data:image/[type];base64,[data]'
                         })
 
                     file_ext = match.group(1).lower()
-                    base64_data = match.group(2)
                     
                     # Normalize extension
                     if file_ext == 'jpeg':
                         file_ext = 'jpg'
 
-                    allowed_exts = ['jpg', 'png', 'gif', 'webp']
-                    if file_ext not in allowed_exts:
+                    if file_ext not in IMAGE_EXTENSIONS:
+                        return JsonResponse({
+                            'statusCode': 400,
+                            'message': f'Image format "{file_ext}" not supported. Allowed: {", ".join(IMAGE_EXTENSIONS)}'
+                        })
+
+                    # Reject oversized images before decoding a second copy
+                    max_bytes = max_image_bytes()
+                    if len(base64_data) * 3 // 4 > max_bytes + 2:
                         return JsonResponse({
                             'statusCode': 400,
-                            'message': f'Image format "{file_ext}" not supported. Allowed: {", ".join(allowed_exts)}'
+                            'message': f'Image size ({len(base64_data) * 3 / 4 / (1024 * 1024):.2f}MB) exceeds {round(max_bytes / (1024 * 1024), 2):g}MB limit'
                         })
                     
                     # Decode base64 data
@@ -111,37 +127,8 @@ class CreateProduct(APIView):
                             'statusCode': 400,
                             'message': 'Invalid base64 image data. Could not decode.'
                         })
-                    
-                    # Check file size (5MB max)
-                    file_size_mb = len(image_bytes) / (1024 * 1024)
-                    if file_size_mb > 5:
-                        return JsonResponse({
-                            'statusCode': 400,
-                            'message': f'Image size ({file_size_mb:.2f}MB) exceeds 5MB limit'
-                        })
-                    
-                    # Generate unique filename
-                    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S_%f')
-                    product_name_slug = ''.join(
-                        char for char in name[:30] if char.isalnum() or char.isspace()
-                    ).replace(' ', '_').lower()
-                    
-                    if not product_name_slug:
-                        product_name_slug = 'product'
-                    
-                    filename = f"product_{product_name_slug}_{timestamp}.{file_ext}"
-                    
-                    # Create media directory
-                    media_dir = os.path.join(settings.BASE_DIR, 'media', 'products')
-                    os.makedirs(media_dir, exist_ok=True)
-                    
-                    # Save file
-                    file_path = os.path.join(media_dir, filename)
-                    with open(file_path, 'wb') as f:
-                        f.write(image_bytes)
-                    
-                    # Set relative URL
-                    image_url = f'/media/products/{filename}'
+
+                    image_url = save_image_bytes(image_bytes, file_ext)
      
                 except Exception as img_error:
                     print(format_exc())
@@ -152,10 +139,13 @@ class CreateProduct(APIView):
                     
             elif image_data.startswith('http://') or image_data.startswith('https://'):
                 image_url = image_data  
+            elif stored_image_exists(image_data):
+                # Uploaded beforehand through product/image-upload
+                image_url = image_data
             else:
                 return JsonResponse({
                     'statusCode': 400,
-                    'message': 'Invalid image format. Must be base64 data URL or HTTP(S) URL'
+                    'message': 'Invalid image format. Must be base64 data URL, HTTP(S) URL or an uploaded image URL'
                 })
             
             product_data = {
@@ -169,6 +159,9 @@ class CreateProduct(APIView):
             }
             
             result = dbconn.Products.insert_one(product_data)
+            catalog_cache.invalidate()
+            # Thumbnails and WebP copies are added to the product in the background
+            schedule_product_image(result.inserted_id, image_url)
         
             product_data['_id'] = str(result.inserted_id)
             product_data['createdOn'] = product_data['createdOn'].isoformat()
@@ -187,28 +180,73 @@ class CreateProduct(APIView):
             })
         
 
+@method_decorator(jwt_required, name='post')
+@method_decorator(admin_required, name='post')
+class UploadProductImage(APIView):
+    """
+    API endpoint to upload a product image as multipart/form-data (admin only)
+    POST /api/product/image-upload
+    Form field: image (jpg, png, gif or webp, up to PRODUCT_IMAGE_MAX_BYTES)
+    The file is streamed to the image store chunk by chunk; pass the returned
+    imageUrl to product-creation instead of a base64 data URL.
+    """
+
+    def post(self, req):
+        try:
+            if not req.content_type.startswith('multipart/form-data'):
+                return JsonResponse({
+                    'statusCode': 400,
+                    'message': 'Bad request, expected multipart/form-data with an image field'
+                })
+
+            # Must be installed before anything reads the body
+            handler = ProductImageUploadHandler(req._request)
+            req._request.upload_handlers = [handler]
+            req._request.FILES  # parses the body through the handler
+
+            if handler.error:
+                return JsonResponse({
+                    'statusCode': 400,
+                    'message': handler.error
+                })
+            if not handler.image_url:
+                return JsonResponse({
+                    'statusCode': 400,
+                    'message': 'Bad request, image not found or empty'
+                })
+
+            return JsonResponse({
+                'statusCode': 201,
+                'message': 'Image uploaded successfully',
+                'data': {'imageUrl': handler.image_url}
+            })
+        except Exception as e:
+            print(format_exc())
+            return JsonResponse({
+                'statusCode': 500,
+                'message': f'Image upload failed: {str(e)}'
+            })
+
+
 class GetProducts(APIView):
     """
     API endpoint to get all products
     GET /api/products
+    The JSON body is encoded once per catalog change and served with a
+    strong ETag, a matching If-None-Match is answered with 304.
     """
     
     def get(self, req):
         try:
-            query = {'isInactive': False, 'activeFlag': True}
-            
-            products = list(dbconn.Products.find(query))
-            
-            for product in products:
-                product['_id'] = str(product['_id'])
-                if 'createdOn' in product:
-                    product['createdOn'] = product['createdOn'].isoformat()
-            return JsonResponse({
-                'statusCode': 200,
-                'message': 'Products retrieved successfully',
-                'data': products,
-                'count': len(products)
-            })
+            body, etag = catalog_cache.rendered(self.render_products)
+            if_none_match = parse_etags(req.headers.get('If-None-Match', ''))
+            if etag in if_none_match or '*' in if_none_match:
+                response = HttpResponse(status=304)
+            else:
+                response = HttpResponse(body, content_type='application/json')
+            response['ETag'] = etag
+            response['Cache-Control'] = 'no-cache'
+            return response
             
         except Exception as e:
             print(format_exc())
@@ -216,6 +254,19 @@ class GetProducts(APIView):
                 'statusCode': 500,
                 'message': 'Internal server error'
             })
+
+    @staticmethod
+    def render_products(products):
+        """Encode the product list response exactly as JsonResponse would"""
+        data = [serialize_product(product) for product in products]
+        return json.dumps({
+            'statusCode': 200,
+            'message': 'Products retrieved successfully',
+            'data': data,
+            'count': len(data)
+        }, cls=DjangoJSONEncoder).encode('utf-8')
+
+
 class GetSpecificProduct(APIView):
     """
     API endpoint to get a single product by ID
@@ -231,7 +282,7 @@ class GetSpecificProduct(APIView):
                     'message': 'Product ID is required'
                 }, status=400)
              
-            product = dbconn.Products.find_one({'_id': ObjectId(data['_id'])})
+            product = catalog_cache.get_product(ObjectId(data['_id']), active_only=False)
             
             if not product:
                 return JsonResponse({
@@ -239,14 +290,10 @@ class GetSpecificProduct(APIView):
                     'message': 'Product not found'
                 }, status=404)
             
-            product['_id'] = str(product['_id'])
-            if 'createdOn' in product:
-                product['createdOn'] = product['createdOn'].isoformat()
-            
             return JsonResponse({
                 'statusCode': 200,
                 'message': 'Product retrieved successfully',
-                'data': product
+                'data': serialize_product(product)
             })
             
         except Exception as e:
@@ -257,9 +304,54 @@ class GetSpecificProduct(APIView):
             })
 
 from django.views.decorators.csrf import csrf_exempt
-from django.utils.decorators import method_decorator
+
+CART_BATCH_MAX_OPERATIONS = 100
+
+
+def cart_item_update(product, quantity, replace=False):
+    """
+    Pipeline update for an active cart row. Adds quantity to the current
+    one (or replaces it), recomputes totalPrice from the current unit price
+    and only fills product details and createdOn when the row is created.
+    """
+    # Values from data go in $literal, inside a pipeline a string starting
+    # with $ would be read as a field path ($$ as a variable)
+    unit_price = {'$literal': product['price']}
+    quantity = {'$literal': quantity}
+    now = datetime.now()
+    new_quantity = quantity if replace else {'$add': [{'$ifNull': ['$quantity', 0]}, quantity]}
+    return [{'$set': {
+        'productName': {'$ifNull': ['$productName', {'$literal': product['name']}]},
+        'productPrice': {'$ifNull': ['$productPrice', unit_price]},
+        'productImageUrl': {'$ifNull': ['$productImageUrl', {'$literal': product['imageUrl']}]},
+        'unitPrice': unit_price,
+        'quantity': new_quantity,
+        'totalPrice': {'$multiply': [new_quantity, unit_price]},
+        'createdOn': {'$ifNull': ['$createdOn', now]},
+        'updatedOn': now,
+        'activeFlag': True,
+        'isInactive': False
+    }}]
+
+
+def upsert_cart_item(fk_user_id, product, quantity):
+    """
+    Add quantity of product to the user's active cart row in one atomic
+    find_one_and_update. The row is created when missing; the unique
+    partial index on active (fkUserId, fkProductId) makes a duplicate row
+    impossible, a concurrent insert that loses the race is retried as an
+    update. Returns the cart row after the change.
+    """
+    update = cart_item_update(product, quantity)
+    query = {'fkUserId': fk_user_id, 'fkProductId': product['_id'], 'activeFlag': True}
+    try:
+        return dbconn.Cart.find_one_and_update(query, update, upsert=True, return_document=ReturnDocument.AFTER)
+    except DuplicateKeyError:
+        return dbconn.Cart.find_one_and_update(query, update, upsert=True, return_document=ReturnDocument.AFTER)
+
 
 @method_decorator(csrf_exempt, name='dispatch')
+@method_decorator(jwt_required, name='post')
 class AddToCart(APIView):
     """
     API endpoint to add a product to user's cart
@@ -268,16 +360,18 @@ class AddToCart(APIView):
         "fkUserId": string,
         "fkProductId": string
     }
+    fkUserId is optional, it must be the logged in user's
     """
     
     def post(self, req):
         try:
             data = loads(req.body)
             
-            if 'fkUserId' not in data or not data['fkUserId']:
+            fk_user_id = request_user_id(req, data.get('fkUserId'))
+            if fk_user_id is None:
                 return JsonResponse({
-                    'statusCode': 400,
-                    'message': 'User required'
+                    'statusCode': 403,
+                    'message': 'Not allowed for this user'
                 })
             
             if 'fkProductId' not in data or not data['fkProductId']:
@@ -286,17 +380,16 @@ class AddToCart(APIView):
                     'message': 'Product is required'
                 })
             
-            fk_user_id = ObjectId(data['fkUserId'])
             fk_product_id = ObjectId(data['fkProductId'])
             
-            user = dbconn.clnUsers.find_one({'_id': fk_user_id, 'activeFlag': True})
+            user = get_active_user(fk_user_id)
             if not user:
                 return JsonResponse({
                     'statusCode': 404,
                     'message': 'User not found'
                 })
             
-            product = dbconn.Products.find_one({'_id': fk_product_id, 'activeFlag': True})
+            product = catalog_cache.get_product(fk_product_id)
             if not product:
                 return JsonResponse({
                     'statusCode': 404,
@@ -312,55 +405,15 @@ class AddToCart(APIView):
                 })
             unit_price = product['price']
             
-            total_price = quantity * unit_price
-            
-            existing_cart_item = dbconn.Cart.find_one({
-                'fkUserId': fk_user_id,
-                'fkProductId': fk_product_id,
-                'activeFlag': True
-            })
+            cart_item = upsert_cart_item(fk_user_id, product, quantity)
             
-            if existing_cart_item:
-                new_quantity = existing_cart_item.get('quantity', 1) + quantity
-                new_total_price = new_quantity * unit_price
-                
-                dbconn.Cart.update_one(
-                    {'_id': existing_cart_item['_id']},
-                    {
-                        '$set': {
-                            'quantity': new_quantity,
-                            'unitPrice': unit_price,
-                            'totalPrice': new_total_price,
-                            'updatedOn': datetime.now()
-                        }
-                    }
-                )
-                
-                cart_item_id = str(existing_cart_item['_id'])
-                message = f'Product quantity updated in cart. New quantity: {new_quantity}'
-                return_quantity = new_quantity
-                return_total_price = new_total_price
-
-            else:
-                cart_item = {
-                    'fkUserId': fk_user_id,
-                    'fkProductId': fk_product_id,
-                    'productName': product['name'],
-                    'productPrice': product['price'],
-                    'productImageUrl': product['imageUrl'],
-                    'unitPrice': unit_price,
-                    'quantity': quantity,
-                    'totalPrice': total_price,
-                    'createdOn': datetime.now(),
-                    'activeFlag': True,
-                    'isInactive': False
-                }
-                
-                result = dbconn.Cart.insert_one(cart_item)
-                cart_item_id = str(result.inserted_id)
+            cart_item_id = str(cart_item['_id'])
+            return_quantity = cart_item['quantity']
+            return_total_price = cart_item['totalPrice']
+            if return_quantity == quantity:
                 message = 'Product added to cart successfully'
-                return_quantity = quantity
-                return_total_price = total_price
+            else:
+                message = f'Product quantity updated in cart. New quantity: {return_quantity}'
             
             return JsonResponse({
                 'statusCode': 200,
@@ -386,6 +439,7 @@ class AddToCart(APIView):
 
 
 @method_decorator(csrf_exempt, name='dispatch')
+@method_decorator(jwt_required, name='post')
 class ProductRemoveFromCart(APIView):
     """
     API endpoint to remove a product from user's cart
@@ -393,6 +447,7 @@ class ProductRemoveFromCart(APIView):
     Payload: {
         "cartItemId": string
     }
+    Only rows of the logged in user's cart are found
     """
     
     def post(self, req):
@@ -405,8 +460,9 @@ class ProductRemoveFromCart(APIView):
                     'message': 'Cart Item required'
                 })
             
-            cart_item_id = ObjectId(data['cartItemId'])
-            cart_item = dbconn.Cart.find_one({'_id': cart_item_id})
+            # Only the logged in user's own cart rows
+            cart_item_query = {'_id': ObjectId(data['cartItemId']), 'fkUserId': request_user_id(req)}
+            cart_item = dbconn.Cart.find_one(cart_item_query)
             if not cart_item:
                 return JsonResponse({
                     'statusCode': 404,
@@ -414,7 +470,7 @@ class ProductRemoveFromCart(APIView):
                 })
             
             result = dbconn.Cart.update_one(
-                {'_id': cart_item_id},
+                cart_item_query,
                 {
                     '$set': {
                         'activeFlag': False,
@@ -445,6 +501,7 @@ class ProductRemoveFromCart(APIView):
                 'message': 'Internal server error'
             })
 # @method_decorator(csrf_exempt, name='dispatch')
+@method_decorator(jwt_required, name='post')
 class GetUserCartDetails(APIView):
     """
     API endpoint to get all active cart items for a user
@@ -452,23 +509,34 @@ class GetUserCartDetails(APIView):
     Payload: {
         "fkUserId": "68fb80cafe953b99976e7c61"
     }
+    fkUserId is optional, it must be the logged in user's. Rows and totals
+    use current catalog prices, the same as checkout; a row whose product
+    is gone has available false and is left out of the totals.
     """
     def post(self, req):
         try:
             data = loads(req.body)
-            if 'fkUserId' not in data or not data['fkUserId']:
+            fk_user_id = request_user_id(req, data.get('fkUserId'))
+            if fk_user_id is None:
                 return JsonResponse({
-                    'statusCode': 400,
-                    'message': 'bad request! user data not found'
+                    'statusCode': 403,
+                    'message': 'Not allowed for this user'
                 })
-            fk_user_id = ObjectId(data['fkUserId'])
             query = {
                 'fkUserId': fk_user_id,
                 'activeFlag': True,
                 'isInactive': False
             }
             cart_items = list(dbconn.Cart.find(query))
+            # Priced like checkout, from the current catalog
+            line_items, _ = price_cart_items(cart_items, catalog_cache.get_products([item['fkProductId'] for item in cart_items]))
+            current = {line['fkProductId']: line for line in line_items}
             for item in cart_items:
+                line = current.get(item['fkProductId'])
+                if line:
+                    item['unitPrice'] = line['unitPrice']
+                    item['totalPrice'] = line['totalPrice']
+                item['available'] = line is not None
                 item['_id'] = str(item['_id'])
                 item['fkUserId'] = str(item['fkUserId'])
                 item['fkProductId'] = str(item['fkProductId'])
@@ -478,11 +546,178 @@ class GetUserCartDetails(APIView):
                 'statusCode': 200,
                 'message': 'Cart items retrieved successfully',
                 'data': cart_items,
-                'count': len(cart_items)
+                'count': len(cart_items),
+                'totals': order_totals(sum(line['totalPrice'] for line in line_items))
+            })
+        except Exception as e:
+            print(format_exc())
+            return JsonResponse({
+                'statusCode': 500,
+                'message': 'Internal server error'
+            })
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+@method_decorator(jwt_required, name='post')
+class CartBatchUpdate(APIView):
+    """
+    API endpoint to apply several cart changes in one request
+    POST /api/product/cart/batch
+    Payload: {
+        "fkUserId": string,
+        "operations": [
+            {"op": "add", "fkProductId": string, "quantity": int},
+            {"op": "set", "fkProductId": string, "quantity": int},
+            {"op": "remove", "cartItemId": string} or {"op": "remove", "fkProductId": string}
+        ]
+    }
+    All referenced products are validated with one lookup and the valid
+    operations are applied in order with a single bulk_write. Each entry of
+    data.results reports ok, error (with message) or skipped when an earlier
+    write failed. fkUserId is optional, it must be the logged in user's.
+    """
+
+    def post(self, req):
+        try:
+            data = loads(req.body)
+
+            fk_user_id = request_user_id(req, data.get('fkUserId'))
+            if fk_user_id is None:
+                return JsonResponse({
+                    'statusCode': 403,
+                    'message': 'Not allowed for this user'
+                })
+
+            operations = data.get('operations')
+            if not isinstance(operations, list) or not operations:
+                return JsonResponse({
+                    'statusCode': 400,
+                    'message': 'Operations required'
+                })
+            if len(operations) > CART_BATCH_MAX_OPERATIONS:
+                return JsonResponse({
+                    'statusCode': 400,
+                    'message': f'At most {CART_BATCH_MAX_OPERATIONS} operations allowed per request'
+                })
+
+            # Resolve every referenced product at once
+            product_ids = {
+                ObjectId(op['fkProductId'])
+                for op in operations
+                if isinstance(op, dict) and ObjectId.is_valid(op.get('fkProductId'))
+            }
+            products = catalog_cache.get_products(list(product_ids))
+
+            # The user's active cart rows, so a remove that would match
+            # nothing is reported as not found instead of ok
+            cart_rows = {}
+            if any(isinstance(op, dict) and op.get('op') == 'remove' for op in operations):
+                cart_rows = {
+                    row['_id']: row['fkProductId']
+                    for row in dbconn.Cart.find(
+                        {'fkUserId': fk_user_id, 'activeFlag': True},
+                        projection={'fkProductId': 1}
+                    )
+                }
+
+            results = []
+            writes = []
+            write_indexes = []
+            now = datetime.now()
+            for index, op in enumerate(operations):
+                result = {'index': index, 'op': op.get('op') if isinstance(op, dict) else None}
+                results.append(result)
+                try:
+                    write = self.build_write(fk_user_id, op, products, now, cart_rows)
+                except ValueError as e:
+                    result.update({'status': 'error', 'message': str(e)})
+                    continue
+                write_indexes.append(index)
+                writes.append(write)
+
+            applied = 0
+            if writes:
+                try:
+                    bulk = dbconn.Cart.bulk_write(writes, ordered=True)
+                    upserted_ids = bulk.upserted_ids
+                    failed = {}
+                except BulkWriteError as e:
+                    upserted_ids = {u['index']: u['_id'] for u in e.details.get('upserted', [])}
+                    failed = {err['index']: err.get('errmsg', 'Write failed') for err in e.details.get('writeErrors', [])}
+                first_failure = min(failed) if failed else len(writes)
+                for position, index in enumerate(write_indexes):
+                    if position < first_failure:
+                        results[index]['status'] = 'ok'
+                        applied += 1
+                        if position in upserted_ids:
+                            results[index]['cartItemId'] = str(upserted_ids[position])
+                    elif position == first_failure:
+                        results[index].update({'status': 'error', 'message': failed[position]})
+                    else:
+                        results[index].update({'status': 'skipped', 'message': 'Not applied, an earlier operation failed'})
+
+            return JsonResponse({
+                'statusCode': 200,
+                'message': f'{applied} of {len(operations)} cart operations applied',
+                'data': {
+                    'fkUserId': str(fk_user_id),
+                    'applied': applied,
+                    'results': results
+                }
             })
+
         except Exception as e:
             print(format_exc())
             return JsonResponse({
                 'statusCode': 500,
                 'message': 'Internal server error'
             })
+
+    @staticmethod
+    def build_write(fk_user_id, op, products, now, cart_rows):
+        """
+        Bulk write model for one operation, ValueError when it is invalid.
+        cart_rows ({row _id: fkProductId} of the active cart) is kept in
+        step with the operations before this one.
+        """
+        if not isinstance(op, dict):
+            raise ValueError('Operation must be an object')
+        kind = op.get('op')
+
+        if kind == 'remove':
+            query = {'fkUserId': fk_user_id, 'activeFlag': True}
+            if ObjectId.is_valid(op.get('cartItemId')):
+                query['_id'] = ObjectId(op['cartItemId'])
+                if query['_id'] not in cart_rows:
+                    raise ValueError('Cart item not found')
+                del cart_rows[query['_id']]
+            elif ObjectId.is_valid(op.get('fkProductId')):
+                query['fkProductId'] = ObjectId(op['fkProductId'])
+                row_ids = [row_id for row_id, product_id in cart_rows.items() if product_id == query['fkProductId']]
+                if not row_ids:
+                    raise ValueError('Cart item not found')
+                for row_id in row_ids:
+                    del cart_rows[row_id]
+            else:
+                raise ValueError('Cart Item required')
+            return UpdateOne(query, {'$set': {'activeFlag': False, 'isInactive': True, 'updatedOn': now}})
+
+        if kind not in ('add', 'set'):
+            raise ValueError('op must be one of add, set, remove')
+        if not ObjectId.is_valid(op.get('fkProductId')):
+            raise ValueError('Product is required')
+        product = products.get(ObjectId(op['fkProductId']))
+        if not product:
+            raise ValueError('Product not found')
+        quantity = op.get('quantity', 1)
+        if not isinstance(quantity, int) or quantity < 1:
+            raise ValueError('Quantity must be a positive integer')
+        # The upserted row's _id is not known yet, a later remove by
+        # fkProductId still finds it
+        if product['_id'] not in cart_rows.values():
+            cart_rows[ObjectId()] = product['_id']
+        return UpdateOne(
+            {'fkUserId': fk_user_id, 'fkProductId': product['_id'], 'activeFlag': True},
+            cart_item_update(product, quantity, replace=(kind == 'set')),
+            upsert=True
+        )
@@ -5,6 +5,11 @@ It exposes the ASGI callable as a module-level variable named ``application``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
+
+The async endpoints under /api/async/ only pay off when served from here,
+e.g. `uvicorn zerasBurgerBackend.asgi:application`. Under WSGI Django runs
+each of them on its own event loop. The order event stream
+(/api/async/order/events) holds its connection open and needs ASGI.
 """
 
 import os
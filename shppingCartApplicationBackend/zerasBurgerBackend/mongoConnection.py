@@ -1,5 +1,9 @@
 import pymongo
 import os
+import asyncio
+from threading import Lock
+from pymongo import monitoring
+from pymongo.read_preferences import make_read_preference, read_pref_mode_from_name
 from dotenv import load_dotenv
 
 
@@ -12,25 +16,229 @@ load_dotenv()
 # print("✅ MongoDB connected successfully!")
 
 MONGO_URI = os.getenv("MONGO_URI")
+DATABASE_NAME = 'shopCart'
 
 if not MONGO_URI:
     raise ValueError(" MONGO_URI not found in .env file!")
 
-try:
-    client = pymongo.MongoClient(MONGO_URI)
-    db = client['shopCart']
-    client.server_info()
-    if os.environ.get('RUN_MAIN') == 'true':
-        print(" MongoDB connected successfully to shopCart database!")
-    
-except pymongo.errors.ConnectionFailure as e:
-    print(f" MongoDB connection failed: {e}")
-    raise
-except Exception as e:
-    print(f" Error connecting to MongoDB: {e}")
-    raise
 
-__all__ = ['client', 'db', 'MONGO_URI']
+class PoolStatsListener(monitoring.ConnectionPoolListener):
+    """Counts connection pool events per server for pool_stats()"""
 
+    def __init__(self):
+        self._lock = Lock()
+        self._servers = {}
 
+    def _add(self, address, **deltas):
+        with self._lock:
+            server = self._servers.setdefault('%s:%s' % address, {
+                'open': 0, 'inUse': 0, 'waiting': 0, 'created': 0, 'closed': 0,
+                'checkedOut': 0, 'checkOutFailed': 0, 'waitQueueTimeouts': 0, 'cleared': 0
+            })
+            for name, delta in deltas.items():
+                server[name] += delta
 
+    def stats(self):
+        with self._lock:
+            return {address: dict(server) for address, server in self._servers.items()}
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        self._add(event.address, cleared=1)
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        self._add(event.address, created=1, open=1)
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        self._add(event.address, closed=1, open=-1)
+
+    def connection_check_out_started(self, event):
+        self._add(event.address, waiting=1)
+
+    def connection_check_out_failed(self, event):
+        timeouts = 1 if event.reason == monitoring.ConnectionCheckOutFailedReason.TIMEOUT else 0
+        self._add(event.address, waiting=-1, checkOutFailed=1, waitQueueTimeouts=timeouts)
+
+    def connection_checked_out(self, event):
+        self._add(event.address, waiting=-1, inUse=1, checkedOut=1)
+
+    def connection_checked_in(self, event):
+        self._add(event.address, inUse=-1)
+
+
+def client_options():
+    """MongoClient keyword arguments from the MONGO_* settings"""
+    from django.conf import settings
+    options = {
+        'maxPoolSize': getattr(settings, 'MONGO_MAX_POOL_SIZE', 100),
+        'minPoolSize': getattr(settings, 'MONGO_MIN_POOL_SIZE', 0),
+        'waitQueueTimeoutMS': getattr(settings, 'MONGO_WAIT_QUEUE_TIMEOUT_MS', None),
+        'serverSelectionTimeoutMS': getattr(settings, 'MONGO_SERVER_SELECTION_TIMEOUT_MS', 30000),
+    }
+    compressors = getattr(settings, 'MONGO_COMPRESSORS', '')
+    if compressors:
+        options['compressors'] = compressors
+    read_preference = getattr(settings, 'MONGO_READ_PREFERENCE', '')
+    if read_preference:
+        options['readPreference'] = read_preference
+    return options
+
+
+def replica_read_preference():
+    """Read preference for reads that may be served by a secondary"""
+    from django.conf import settings
+    mode = read_pref_mode_from_name(getattr(settings, 'MONGO_REPLICA_READ_PREFERENCE', 'secondaryPreferred'))
+    return make_read_preference(mode, None, getattr(settings, 'MONGO_REPLICA_MAX_STALENESS', -1))
+
+
+# The client is created on first use in each process, never at import, so
+# manage.py commands start without a round trip and a forked worker (e.g.
+# gunicorn --preload) never shares the parent's sockets
+_client_lock = Lock()
+_client_state = None
+
+
+def _current():
+    global _client_state
+    state = _client_state
+    if state is None or state[0] != os.getpid():
+        with _client_lock:
+            state = _client_state
+            if state is None or state[0] != os.getpid():
+                listener = PoolStatsListener()
+                options = client_options()
+                mongo_client = pymongo.MongoClient(MONGO_URI, event_listeners=[listener], **options)
+                read_db = mongo_client.get_database(DATABASE_NAME, read_preference=replica_read_preference())
+                state = (os.getpid(), mongo_client, listener, options, read_db)
+                _client_state = state
+                if os.environ.get('RUN_MAIN') == 'true':
+                    print(f" MongoDB client ready for {DATABASE_NAME} database (pid {os.getpid()})")
+    return state
+
+
+def get_client():
+    """MongoClient for the current process"""
+    return _current()[1]
+
+
+def get_db():
+    """shopCart database on the current process's client"""
+    return get_client()[DATABASE_NAME]
+
+
+def get_read_db():
+    """
+    shopCart database for reads that tolerate replication lag (catalog
+    browsing, order history). Goes to a secondary when the replica set
+    has one within MONGO_REPLICA_MAX_STALENESS; writes and reads that must
+    see the caller's own writes use get_db().
+    """
+    return _current()[4]
+
+
+def pool_stats():
+    """
+    Connection pool counters of this process, per server: open and inUse
+    connections, requests waiting for one, and totals of created, closed,
+    checked out, failed check outs and wait queue timeouts. Every worker
+    process has its own pool, so size maxPoolSize against the number of
+    workers times their threads.
+    """
+    pid, _, listener, options, _ = _current()
+    return {'pid': pid, 'options': options, 'servers': listener.stats()}
+
+
+class _LazyClient:
+    """Module level stand-in for the process's MongoClient"""
+
+    def __getattr__(self, name):
+        return getattr(get_client(), name)
+
+    def __getitem__(self, name):
+        return get_client()[name]
+
+
+class _LazyDatabase:
+    """Module level stand-in for the shopCart database"""
+
+    def __getattr__(self, name):
+        return getattr(get_db(), name)
+
+    def __getitem__(self, name):
+        return get_db()[name]
+
+
+class _LazyReadDatabase:
+    """Module level stand-in for the replica read database"""
+
+    def __getattr__(self, name):
+        return getattr(get_read_db(), name)
+
+    def __getitem__(self, name):
+        return get_read_db()[name]
+
+
+client = _LazyClient()
+db = _LazyDatabase()
+read_db = _LazyReadDatabase()
+
+# Async clients are bound to the event loop they first run on, keep one
+# per loop (one under uvicorn/daphne, one per request under WSGI or
+# runserver). loop -> (client, closer), removed when the loop shuts down.
+_async_clients = {}
+
+
+async def _close_with_loop(loop, async_client):
+    """
+    Parked on the client's loop until the loop shuts down: asyncio.run
+    (used by uvicorn and by Django for async views under WSGI) finalizes
+    pending async generators before closing the loop, which closes the
+    client and forgets the loop instead of keeping both per request.
+    """
+    try:
+        yield
+    finally:
+        _async_clients.pop(loop, None)
+        await async_client.close()
+
+
+def _async_client():
+    loop = asyncio.get_running_loop()
+    entry = _async_clients.get(loop)
+    if entry is None:
+        async_client = pymongo.AsyncMongoClient(MONGO_URI, **client_options())
+        # Run the closer up to its yield right away, so it is registered
+        # with the loop even if the loop finishes before running a task.
+        # The entry keeps it alive, a collected generator would be finalized
+        # (and the client closed) immediately.
+        closer = _close_with_loop(loop, async_client)
+        try:
+            closer.__anext__().send(None)
+        except StopIteration:
+            pass
+        entry = _async_clients[loop] = (async_client, closer)
+    return entry[0]
+
+
+def get_async_db():
+    """shopCart database on a PyMongo AsyncMongoClient for the running loop"""
+    return _async_client()[DATABASE_NAME]
+
+
+def get_async_read_db():
+    """Async counterpart of get_read_db"""
+    return _async_client().get_database(DATABASE_NAME, read_preference=replica_read_preference())
+
+
+__all__ = ['client', 'db', 'read_db', 'MONGO_URI', 'get_client', 'get_db', 'get_read_db', 'get_async_db', 'get_async_read_db', 'pool_stats']
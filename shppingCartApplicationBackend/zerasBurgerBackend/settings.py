@@ -113,6 +113,82 @@ from .mongoConnection import db, client, MONGO_URI
 # }
 
 
+# MongoDB client, created lazily once per process (zerasBurgerBackend/mongoConnection.py).
+# Every worker process holds its own pool, so the server can see up to
+# workers x MONGO_MAX_POOL_SIZE connections. MONGO_COMPRESSORS is a comma
+# separated list (zstd, snappy, zlib); MONGO_READ_PREFERENCE e.g.
+# primaryPreferred. Leave either empty to use what MONGO_URI specifies.
+MONGO_MAX_POOL_SIZE = int(os.getenv('MONGO_MAX_POOL_SIZE', 100))
+MONGO_MIN_POOL_SIZE = int(os.getenv('MONGO_MIN_POOL_SIZE', 0))
+MONGO_WAIT_QUEUE_TIMEOUT_MS = int(os.getenv('MONGO_WAIT_QUEUE_TIMEOUT_MS', 0)) or None
+MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv('MONGO_SERVER_SELECTION_TIMEOUT_MS', 5000))
+MONGO_COMPRESSORS = os.getenv('MONGO_COMPRESSORS', '')
+MONGO_READ_PREFERENCE = os.getenv('MONGO_READ_PREFERENCE', '')
+# Catalog and order history reads (mongoConnection.read_db) may go to a
+# secondary. Max staleness is in seconds, -1 for no limit, otherwise at
+# least 90; a lagging secondary beyond it is skipped for the primary.
+MONGO_REPLICA_READ_PREFERENCE = os.getenv('MONGO_REPLICA_READ_PREFERENCE', 'secondaryPreferred')
+MONGO_REPLICA_MAX_STALENESS = int(os.getenv('MONGO_REPLICA_MAX_STALENESS', -1))
+# Serve per-worker pool counters on /api/health/mongo-pool
+MONGO_POOL_STATS = os.getenv('MONGO_POOL_STATS', 'false').lower() == 'true'
+
+# Create the indexes declared in CustomerApp/indexes.py when the app starts.
+# `python manage.py ensure_indexes` does the same on demand.
+MONGO_ENSURE_INDEXES = os.getenv('MONGO_ENSURE_INDEXES', 'true').lower() == 'true'
+
+# In-process product catalog cache (CustomerApp/catalog.py). Set
+# CATALOG_CHANGE_STREAM on a replica set to invalidate on writes made by
+# other processes instead of waiting for the TTL.
+CATALOG_CACHE_TTL = int(os.getenv('CATALOG_CACHE_TTL', 60))
+CATALOG_CACHE_MAX_SIZE = int(os.getenv('CATALOG_CACHE_MAX_SIZE', 1000))
+CATALOG_CHANGE_STREAM = os.getenv('CATALOG_CHANGE_STREAM', 'false').lower() == 'true'
+
+# Short-lived per-process cache of user documents (CustomerApp/users.py).
+# Writes to clnUsers through the app invalidate the entry in the process
+# that made them; other workers, and changes made directly in the
+# database (deactivating a user, changing a role), are seen at most
+# USER_CACHE_TTL seconds later.
+USER_CACHE_TTL = int(os.getenv('USER_CACHE_TTL', 30))
+USER_CACHE_MAX_SIZE = int(os.getenv('USER_CACHE_MAX_SIZE', 10000))
+
+# Optional JSON file with rotating JWT keys, see CustomerApp/tokens.py.
+# It is re-read when it changes, so rotating keys needs no restart.
+JWT_KEYS_FILE = os.getenv('JWT_KEYS_FILE') or None
+JWT_KEYS_RELOAD_INTERVAL = int(os.getenv('JWT_KEYS_RELOAD_INTERVAL', 30))
+
+# Verified JWT claims kept in memory per process (CustomerApp/utils.py)
+JWT_CLAIMS_CACHE_SIZE = int(os.getenv('JWT_CLAIMS_CACHE_SIZE', 10000))
+
+# bcrypt runs on a bounded pool per process; requests beyond workers plus
+# queue depth get a 503 instead of waiting. Existing hashes with another
+# cost are rehashed on the next successful login.
+BCRYPT_ROUNDS = int(os.getenv('BCRYPT_ROUNDS', 12))
+PASSWORD_HASH_WORKERS = int(os.getenv('PASSWORD_HASH_WORKERS', 2))
+PASSWORD_HASH_QUEUE_DEPTH = int(os.getenv('PASSWORD_HASH_QUEUE_DEPTH', 8))
+PASSWORD_HASH_TIMEOUT = float(os.getenv('PASSWORD_HASH_TIMEOUT', 10))
+
+# Login throttling (CustomerApp/ratelimit.py): token buckets per email and
+# per client IP, plus a lockout after LOGIN_MAX_FAILURES failed logins
+# within LOGIN_FAILURE_WINDOW seconds. Set LOGIN_RATE_LIMIT_BACKEND=cache
+# to share the state between processes through the Django cache named by
+# LOGIN_RATE_LIMIT_CACHE.
+LOGIN_RATE_LIMIT_BACKEND = os.getenv('LOGIN_RATE_LIMIT_BACKEND', 'memory')
+LOGIN_RATE_LIMIT_CACHE = os.getenv('LOGIN_RATE_LIMIT_CACHE', 'default')
+LOGIN_RATE_LIMIT_EMAIL_BURST = int(os.getenv('LOGIN_RATE_LIMIT_EMAIL_BURST', 10))
+LOGIN_RATE_LIMIT_IP_BURST = int(os.getenv('LOGIN_RATE_LIMIT_IP_BURST', 30))
+LOGIN_RATE_LIMIT_PERIOD = int(os.getenv('LOGIN_RATE_LIMIT_PERIOD', 60))
+LOGIN_MAX_FAILURES = int(os.getenv('LOGIN_MAX_FAILURES', 5))
+LOGIN_FAILURE_WINDOW = int(os.getenv('LOGIN_FAILURE_WINDOW', 900))
+LOGIN_RATE_LIMIT_TRUST_X_FORWARDED_FOR = os.getenv('LOGIN_RATE_LIMIT_TRUST_X_FORWARDED_FOR', 'false').lower() == 'true'
+# Serve per-worker allowed/rejected/failed login counters on
+# /api/health/login-limiter
+LOGIN_RATE_LIMIT_STATS = os.getenv('LOGIN_RATE_LIMIT_STATS', 'false').lower() == 'true'
+
+# Order numbers reserved per worker process in a single counter update.
+# 1 keeps numbers strictly sequential, larger blocks save round trips.
+ORDER_NUMBER_BLOCK_SIZE = int(os.getenv('ORDER_NUMBER_BLOCK_SIZE', 1))
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -155,6 +231,56 @@ MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 # Create media directory
 os.makedirs(MEDIA_ROOT, exist_ok=True)
 
+# Media responses (CustomerApp/views/media.py). Content hashed images are
+# always cached as immutable, other files for MEDIA_CACHE_MAX_AGE seconds.
+# Set MEDIA_ACCEL_REDIRECT_PREFIX (e.g. /protected-media/) to an internal
+# nginx location aliasing MEDIA_ROOT to let nginx send the bytes.
+MEDIA_CACHE_MAX_AGE = int(os.getenv('MEDIA_CACHE_MAX_AGE', 86400))
+MEDIA_ACCEL_REDIRECT_PREFIX = os.getenv('MEDIA_ACCEL_REDIRECT_PREFIX', '')
+
+# Product images are stored by content hash (CustomerApp/storage.py), the
+# same bytes are stored once. "local" keeps them under MEDIA_ROOT; "s3"
+# puts them in an S3 compatible bucket shared by every app node. For a
+# local MinIO stand-in set IMAGE_STORE_S3_ENDPOINT_URL=http://localhost:9000
+# and IMAGE_STORE_PUBLIC_URL to where the bucket is reachable by browsers.
+# IMAGE_STORE_PUBLIC_URL is the bucket root, without IMAGE_STORE_S3_PREFIX:
+# image URLs are IMAGE_STORE_PUBLIC_URL/<prefix>/<key>.
+IMAGE_STORE_BACKEND = os.getenv('IMAGE_STORE_BACKEND', 'local')
+IMAGE_STORE_S3_BUCKET = os.getenv('IMAGE_STORE_S3_BUCKET', '')
+IMAGE_STORE_S3_PREFIX = os.getenv('IMAGE_STORE_S3_PREFIX', '')
+IMAGE_STORE_S3_ENDPOINT_URL = os.getenv('IMAGE_STORE_S3_ENDPOINT_URL') or None
+IMAGE_STORE_S3_REGION = os.getenv('IMAGE_STORE_S3_REGION') or None
+IMAGE_STORE_S3_ACCESS_KEY = os.getenv('IMAGE_STORE_S3_ACCESS_KEY') or None
+IMAGE_STORE_S3_SECRET_KEY = os.getenv('IMAGE_STORE_S3_SECRET_KEY') or None
+IMAGE_STORE_PUBLIC_URL = os.getenv('IMAGE_STORE_PUBLIC_URL') or None
+
+# Largest product image accepted by product/image-upload and the base64
+# path of product-creation (CustomerApp/images.py)
+PRODUCT_IMAGE_MAX_BYTES = int(os.getenv('PRODUCT_IMAGE_MAX_BYTES', 5 * 1024 * 1024))
+
+# Resized WebP and JPEG/PNG variants generated after upload by a background
+# pool (CustomerApp/image_variants.py, needs Pillow) and recorded on the
+# product as imageVariants. Widths are comma separated pixels.
+PRODUCT_IMAGE_VARIANT_WIDTHS = tuple(int(w) for w in os.getenv('PRODUCT_IMAGE_VARIANT_WIDTHS', '320,640,1024').split(','))
+PRODUCT_IMAGE_QUALITY = int(os.getenv('PRODUCT_IMAGE_QUALITY', 80))
+PRODUCT_IMAGE_WORKERS = int(os.getenv('PRODUCT_IMAGE_WORKERS', 2))
+
+# Order changes pushed to api/async/order/events as server-sent events
+# (CustomerApp/events.py, served from the ASGI entry point). "memory" only
+# reaches streams open on the process that made the change, enough for a
+# single uvicorn process. "change-stream" watches the Orders collection
+# (replica set needed) so every node sees every write; a dotted path
+# selects a broker class of your own. A stream more than
+# ORDER_EVENTS_QUEUE_SIZE events behind is closed, an idle one gets a
+# keep-alive every ORDER_EVENTS_HEARTBEAT seconds.
+ORDER_EVENTS_BACKEND = os.getenv('ORDER_EVENTS_BACKEND', 'memory')
+ORDER_EVENTS_QUEUE_SIZE = int(os.getenv('ORDER_EVENTS_QUEUE_SIZE', 100))
+ORDER_EVENTS_HEARTBEAT = int(os.getenv('ORDER_EVENTS_HEARTBEAT', 15))
+# EventSource puts its token in the URL, so the stream is opened with a
+# single-purpose token (POST order/events/token) that expires after
+# ORDER_EVENTS_TOKEN_SECONDS instead of the login token.
+ORDER_EVENTS_TOKEN_SECONDS = int(os.getenv('ORDER_EVENTS_TOKEN_SECONDS', 60))
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
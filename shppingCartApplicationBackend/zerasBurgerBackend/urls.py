@@ -15,14 +15,15 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 from django.contrib import admin
-from django.urls import include, path
+from django.urls import include, path, re_path
 from django.conf import settings
-from django.conf.urls.static import static
+from CustomerApp.views.media import serve_media
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include('CustomerApp.urls'))
    
 ]
-if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+# Uploaded media, in production too (see CustomerApp/views/media.py)
+if settings.MEDIA_URL.startswith('/'):
+    urlpatterns += [re_path(r'^%s(?P<path>.+)$' % settings.MEDIA_URL.lstrip('/'), serve_media, name='media')]